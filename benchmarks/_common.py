@@ -0,0 +1,74 @@
+"""
+Общие помощники бенчмарков.
+Скрипты запускаются из корня репозитория (python benchmarks/<name>.py) и импортируют код приложения напрямую.
+"""
+import logging
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from opentelemetry import metrics, trace
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+
+class BenchLogger:
+    """Логгер с интерфейсом IOtelLogger поверх logging: бенчмаркам не нужен OTLP-коллектор"""
+
+    def __init__(self):
+        self._logger = logging.getLogger("benchmark")
+
+    def debug(self, message: str, fields: dict = None) -> None:
+        self._logger.debug(message)
+
+    def info(self, message: str, fields: dict = None) -> None:
+        self._logger.info(message)
+
+    def warning(self, message: str, fields: dict = None) -> None:
+        self._logger.warning(message)
+
+    def error(self, message: str, fields: dict = None) -> None:
+        self._logger.error(message)
+
+
+class BenchTelemetry:
+    """ITelemetry на no-op провайдерах OpenTelemetry: спаны и метрики создаются, но никуда не уходят"""
+
+    def __init__(self):
+        self._logger = BenchLogger()
+
+    def tracer(self) -> trace.Tracer:
+        return trace.get_tracer("benchmark")
+
+    def meter(self) -> metrics.Meter:
+        return metrics.get_meter("benchmark")
+
+    def logger(self) -> BenchLogger:
+        return self._logger
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        resident_pages = int(statm.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def peak_rss_mb() -> float:
+    # На Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def best_of(func, repeat: int) -> float:
+    """Минимальное время из repeat прогонов: меньше всего зависит от шума машины"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
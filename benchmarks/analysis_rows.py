@@ -0,0 +1,168 @@
+"""
+Строк в секунду на пути строка БД -> модель -> JSON для списка анализов.
+
+    python benchmarks/analysis_rows.py --rows 10000
+
+legacy — путь до явных списков колонок: @dataclass собирается по именам атрибутов строки,
+to_dict() вызывает isoformat() для дат, ответ кодируется json.dumps как в JSONResponse.
+current — model.Analysis (slots) собирается позиционно, дальше тот же to_dict() и json.dumps:
+выигрыш даёт только сборка модели, кодирование JSON у обоих путей общее.
+Строки — namedtuple: как и Row/Record драйвера, они поддерживают и атрибуты, и позиционный доступ.
+"""
+import argparse
+import json
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from _common import best_of
+
+from internal import model
+
+Row = namedtuple("Row", model.ANALYSIS_FIELDS)
+
+
+@dataclass
+class LegacyAnalysis:
+    id: int
+
+    nurse_id: int
+    doctor_id: int
+
+    analysis_type: str
+    study_file_fid: str
+    study_file_original_name: str
+    activity_diary_image_fid: str
+    activity_diary_original_name: str
+    status: str
+    conclusion_file_fid: str
+    conclusion_file_original_name: str
+    rejection_comment: str
+
+    started_at: datetime | None
+    finished_at: datetime | None
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list["LegacyAnalysis"]:
+        return [
+            cls(
+                id=row.id,
+                nurse_id=row.nurse_id,
+                doctor_id=row.doctor_id,
+                analysis_type=row.analysis_type,
+                study_file_fid=row.study_file_fid,
+                study_file_original_name=row.study_file_original_name,
+                activity_diary_image_fid=row.activity_diary_image_fid,
+                activity_diary_original_name=row.activity_diary_original_name,
+                status=row.status,
+                conclusion_file_fid=row.conclusion_file_fid,
+                conclusion_file_original_name=row.conclusion_file_original_name,
+                rejection_comment=row.rejection_comment,
+                started_at=row.started_at,
+                finished_at=row.finished_at,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "nurse_id": self.nurse_id,
+            "doctor_id": self.doctor_id,
+            "analysis_type": self.analysis_type,
+            "study_file_fid": self.study_file_fid,
+            "study_file_original_name": self.study_file_original_name,
+            "activity_diary_image_fid": self.activity_diary_image_fid,
+            "activity_diary_original_name": self.activity_diary_original_name,
+            "status": self.status,
+            "conclusion_file_fid": self.conclusion_file_fid,
+            "conclusion_file_original_name": self.conclusion_file_original_name,
+            "rejection_comment": self.rejection_comment,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+def make_rows(count: int) -> list[Row]:
+    created_at = datetime(2025, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        finished = i % 3 == 0
+        rows.append(
+            Row(
+                i + 1,
+                i % 200 + 1,
+                i % 20 + 1 if finished else 0,
+                "holter",
+                f"3,{i:010x}",
+                f"Холтер пациента {i}.zip",
+                f"4,{i:010x}",
+                f"Дневник {i}.jpg",
+                "completed" if finished else "pending",
+                f"5,{i:010x}" if finished else "",
+                f"Заключение {i}.pdf" if finished else "",
+                "",
+                created_at + timedelta(minutes=i, seconds=30) if finished else None,
+                created_at + timedelta(minutes=i + 5) if finished else None,
+                created_at + timedelta(minutes=i),
+                created_at + timedelta(minutes=i + 5),
+            )
+        )
+    return rows
+
+
+def encode_response(content: dict) -> bytes:
+    # Так кодирует starlette JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def legacy_response(rows: list[Row]) -> bytes:
+    analyses = LegacyAnalysis.serialize(rows)
+    return encode_response({"analyses": [analysis.to_dict() for analysis in analyses]})
+
+
+def current_response(rows: list[Row]) -> bytes:
+    analyses = model.Analysis.serialize(rows)
+    return encode_response({"analyses": [analysis.to_dict() for analysis in analyses]})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    # Оба пути должны отдавать один и тот же JSON
+    assert json.loads(legacy_response(rows)) == json.loads(current_response(rows))
+
+    stages = {
+        "serialize": (
+            lambda: LegacyAnalysis.serialize(rows),
+            lambda: model.Analysis.serialize(rows),
+        ),
+        "serialize + JSON": (
+            lambda: legacy_response(rows),
+            lambda: current_response(rows),
+        ),
+    }
+
+    print(f"{args.rows} строк, лучший из {args.repeat} прогонов")
+    for stage, (legacy, current) in stages.items():
+        legacy_rate = args.rows / best_of(legacy, args.repeat)
+        current_rate = args.rows / best_of(current, args.repeat)
+        print(
+            f"  {stage:<17} legacy {legacy_rate:>12,.0f} rows/s"
+            f"  current {current_rate:>12,.0f} rows/s  x{current_rate / legacy_rate:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
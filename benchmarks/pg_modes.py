@@ -0,0 +1,161 @@
+"""
+Пропускная способность и задержки PG в двух режимах: SQLAlchemy AsyncSession + text() и прямой asyncpg.
+
+    python benchmarks/pg_modes.py --init-schema --seed 10000
+
+Запросы идут через AnalysisRepo, то есть те же sql_query и тот же интерфейс IDB, что и в приложении:
+point — get_analysis_by_id, page — страница get_analyses на 100 строк, insert — create_analysis.
+Подключение берётся из тех же переменных, что и в config.py (EMU_BACKEND_POSTGRES_*).
+Скрипт пишет в таблицу analyses, поэтому запускать его нужно на отдельной базе.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from _common import BenchTelemetry
+
+from infrastructure.pg.pg import PG
+from internal import model
+from internal.repo.analysis.repo import AnalysisRepo
+
+MODES = {"sqlalchemy": False, "asyncpg": True}
+
+
+def make_db(args: argparse.Namespace, raw_asyncpg: bool) -> PG:
+    return PG(
+        BenchTelemetry(),
+        args.user,
+        args.password,
+        args.host,
+        args.port,
+        args.db,
+        raw_asyncpg=raw_asyncpg,
+        pool_size=args.concurrency,
+        max_overflow=0,
+    )
+
+
+async def close_db(db: PG) -> None:
+    # У PG нет close(): приложение держит пулы до конца процесса
+    await db.pool.kw["bind"].dispose()
+    if db._raw_pool is not None:
+        await db._raw_pool.close()
+
+
+def seed_records(count: int):
+    created_at = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(count):
+        yield (
+            i % 200 + 1,
+            0,
+            "holter",
+            f"3,{i:010x}",
+            f"study_{i}.zip",
+            "",
+            "",
+            "pending",
+            "",
+            "",
+            "",
+            None,
+            None,
+            created_at + timedelta(seconds=i),
+            created_at + timedelta(seconds=i),
+        )
+
+
+async def run_workload(operation, total: int, concurrency: int) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+async def bench_mode(args: argparse.Namespace, mode: str, analysis_ids: list[int]) -> dict[str, tuple]:
+    db = make_db(args, MODES[mode])
+    repo = AnalysisRepo(BenchTelemetry(), db)
+    page_filter = model.AnalysisFilter()
+
+    workloads = {
+        "point": lambda: repo.get_analysis_by_id(random.choice(analysis_ids)),
+        "page": lambda: repo.get_analyses(page_filter, 100),
+        "insert": lambda: repo.create_analysis(1, "holter", "3,bench", "bench.zip", None, None),
+    }
+
+    results = {}
+    try:
+        for name, operation in workloads.items():
+            # Прогрев: соединения пула и кэш подготовленных запросов
+            await run_workload(operation, args.concurrency * 10, args.concurrency)
+            elapsed, latencies = await run_workload(operation, args.ops, args.concurrency)
+            latencies.sort()
+            results[name] = (
+                args.ops / elapsed,
+                statistics.median(latencies) * 1000,
+                latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            )
+    finally:
+        await close_db(db)
+
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    db = make_db(args, raw_asyncpg=True)
+    try:
+        if args.init_schema:
+            await db.multi_query(model.create_tables_queries)
+        if args.seed:
+            loaded = await AnalysisRepo(BenchTelemetry(), db).import_analyses(seed_records(args.seed))
+            print(f"Загружено {loaded} анализов")
+        rows = await db.select("SELECT id FROM analyses ORDER BY id DESC LIMIT 10000", {})
+    finally:
+        await close_db(db)
+
+    analysis_ids = [row[0] for row in rows]
+    if not analysis_ids:
+        raise SystemExit("Таблица analyses пуста: запустите с --seed N")
+
+    results = {mode: await bench_mode(args, mode, analysis_ids) for mode in MODES}
+
+    print(f"{args.ops} операций на нагрузку, {args.concurrency} конкурентных запросов")
+    for workload in ("point", "page", "insert"):
+        base_rate = results["sqlalchemy"][workload][0]
+        for mode in MODES:
+            rate, p50, p99 = results[mode][workload]
+            print(
+                f"  {workload:<7}{mode:<11}{rate:>10,.0f} ops/s"
+                f"  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  x{rate / base_rate:.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("EMU_BACKEND_POSTGRES_CONTAINER_NAME", "localhost"))
+    parser.add_argument("--port", default=os.getenv("EMU_BACKEND_POSTGRES_PORT", "5432"))
+    parser.add_argument("--db", default=os.getenv("EMU_BACKEND_POSTGRES_DB_NAME", "hr_interview"))
+    parser.add_argument("--user", default=os.getenv("EMU_BACKEND_POSTGRES_USER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("EMU_BACKEND_POSTGRES_PASSWORD", "password"))
+    parser.add_argument("--ops", type=int, default=5000, help="операций на нагрузку в каждом режиме")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--init-schema", action="store_true", help="создать таблицы приложения")
+    parser.add_argument("--seed", type=int, default=0, help="загрузить N анализов через COPY")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
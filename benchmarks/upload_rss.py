@@ -0,0 +1,155 @@
+"""
+Пиковый RSS при загрузке большого файла в SeaweedFS: буферизованный путь против потокового.
+
+    python benchmarks/upload_rss.py --size-mb 500
+
+buffered — путь до потоковой загрузки: файл целиком читается в память, оборачивается в BytesIO
+и уходит через AsyncWeed.upload. stream — AsyncWeed.upload_stream со spooled-файлом, как его
+передаёт UploadFile. Каждый режим запускается в отдельном процессе против локального фейкового
+master/volume, который вычитывает тело запроса и ничего не хранит, поэтому RSS измеряется только
+у клиента. Скрипт завершается с кодом 1, если прирост RSS потокового режима выше --max-stream-mb.
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import BenchTelemetry, current_rss_mb, peak_rss_mb
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def serve(port: int) -> None:
+    """Фейковые master (/dir/assign) и volume (POST /{fid}): тело запроса читается чанками и отбрасывается"""
+    from aiohttp import web
+
+    async def assign(request: web.Request) -> web.Response:
+        count = int(request.query.get("count", "1"))
+        return web.json_response({"fid": "1,01637037d6", "url": f"127.0.0.1:{port}", "count": count})
+
+    async def upload(request: web.Request) -> web.Response:
+        size = 0
+        async for chunk in request.content.iter_chunked(READ_CHUNK_SIZE):
+            size += len(chunk)
+        return web.json_response({"size": size}, status=201)
+
+    app = web.Application()
+    app.router.add_get("/dir/assign", assign)
+    app.router.add_post("/{fid}", upload)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Фейковый SeaweedFS не поднялся на порту {port}")
+
+
+def make_file(path: str, size_mb: int) -> None:
+    block = os.urandom(READ_CHUNK_SIZE)
+    with open(path, "wb") as file:
+        for _ in range(size_mb):
+            file.write(block)
+
+
+async def run_upload(mode: str, port: int, path: str) -> dict:
+    from infrastructure.weedfs.weedfs import AsyncWeed
+
+    storage = AsyncWeed(BenchTelemetry(), "127.0.0.1", port, timeout=600, fid_batch_size=1)
+    baseline_mb = current_rss_mb()
+    started = time.perf_counter()
+
+    with open(path, "rb") as file:
+        if mode == "buffered":
+            content = file.read()
+            result = await storage.upload(io.BytesIO(content), "study.bin")
+            del content
+        else:
+            result = await storage.upload_stream(file, "study.bin")
+
+    elapsed = time.perf_counter() - started
+    await storage.close()
+
+    return {
+        "mode": mode,
+        "uploaded_mb": result.size / (1024 * 1024),
+        "baseline_rss_mb": baseline_mb,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_delta_mb": peak_rss_mb() - baseline_mb,
+        "throughput_mb_s": result.size / (1024 * 1024) / elapsed,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=500)
+    parser.add_argument("--max-stream-mb", type=float, default=64, help="допустимый прирост RSS в режиме stream")
+    parser.add_argument("--mode", choices=["buffered", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Дочерний процесс: один режим, результат — JSON в stdout
+    if args.mode:
+        print(json.dumps(asyncio.run(run_upload(args.mode, args.port, args.file))))
+        return 0
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "study.bin")
+        make_file(path, args.size_mb)
+        wait_for_port(port)
+
+        results = {}
+        try:
+            for mode in ("buffered", "stream"):
+                completed = subprocess.run(
+                    [sys.executable, __file__, "--mode", mode, "--port", str(port), "--file", path],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+        finally:
+            server.terminate()
+
+    print(f"Файл {args.size_mb} MB")
+    for result in results.values():
+        print(
+            f"  {result['mode']:<9} пик RSS {result['peak_rss_mb']:8.1f} MB"
+            f"  прирост {result['peak_delta_mb']:8.1f} MB"
+            f"  {result['throughput_mb_s']:7.1f} MB/s"
+        )
+
+    stream_delta = results["stream"]["peak_delta_mb"]
+    if stream_delta > args.max_stream_mb:
+        print(f"FAIL: прирост RSS в режиме stream {stream_delta:.1f} MB > {args.max_stream_mb} MB")
+        return 1
+
+    print(f"OK: прирост RSS в режиме stream не зависит от размера файла (≤ {args.max_stream_mb} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import asyncio
+import fcntl
+import io
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import BinaryIO
+
+from internal import interface, model
+
+# Временный файл старше этого срока — остаток прерванной записи (свежие может дописывать другой воркер)
+STALE_TMP_SECONDS = 3600
+# Блокировка каталога: индекс и учёт байтов живут в памяти одного процесса
+LOCK_FILE_NAME = ".lock"
+# Рядом с файлом хранятся заголовки ответа storage, попадание отдаётся с теми же заголовками, что и промах
+META_SUFFIX = ".meta"
+
+
+class DiskCacheStorage(interface.IStorage):
+    """
+    Локальный LRU-кэш файлов на диске перед storage.
+    Ключ — fid: содержимое по fid неизменно, поэтому сбрасывать запись нужно только на update/delete.
+    Кэш однопроцессный: каталог захватывается flock, и в остальных воркерах с тем же каталогом кэш выключен.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            storage: interface.IStorage,
+            cache_dir: str,
+            max_bytes: int,
+    ):
+        self.logger = tel.logger()
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+
+        self._lock_file = self._lock_cache_dir()
+        self.enabled = self._lock_file is not None
+        if self.enabled:
+            self._load_entries()
+
+    def _lock_cache_dir(self) -> BinaryIO | None:
+        """
+        Захватить каталог кэша. Второй процесс с тем же каталогом вёл бы свой индекс:
+        диск занимал бы до N × max_bytes, а вытеснение одного удаляло бы файлы, которые отдаёт другой
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        lock_file = open(os.path.join(self.cache_dir, LOCK_FILE_NAME), "ab")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            self.logger.error(
+                f"Каталог дискового кэша {self.cache_dir} занят другим процессом, кэш в этом процессе выключен. "
+                "Кэш однопроцессный: при нескольких воркерах он работает только в одном из них"
+            )
+            return None
+
+        return lock_file
+
+    def _load_entries(self) -> None:
+        """Восстановить индекс кэша с диска, от давно читаных к недавним"""
+        files = []
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            stat = entry.stat()
+            if entry.name.endswith(".tmp"):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    self._unlink(entry.path)
+                continue
+            if entry.name.endswith(META_SUFFIX):
+                if not os.path.exists(entry.path.removesuffix(META_SUFFIX)):
+                    self._unlink(entry.path)
+                continue
+            files.append((stat.st_atime, entry.name, stat.st_size))
+
+        for _, file_name, size in sorted(files):
+            self._entries[file_name] = size
+            self._total_bytes += size
+
+        self._evict()
+
+    def _path(self, fid: str) -> str:
+        return os.path.join(self.cache_dir, self._key(fid))
+
+    @staticmethod
+    def _key(fid: str) -> str:
+        return fid.replace(",", "-")
+
+    async def upload(self, file: io.BytesIO, name: str) -> model.AsyncWeedOperationResponse:
+        return await self.storage.upload(file, name)
+
+    async def upload_stream(
+            self,
+            stream: AsyncIterable[bytes] | BinaryIO,
+            name: str,
+    ) -> model.AsyncWeedOperationResponse:
+        return await self.storage.upload_stream(stream, name)
+
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+        key = self._key(fid)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            try:
+                meta = await asyncio.to_thread(self._read_meta, self._path(fid))
+                content = await asyncio.to_thread(self._read_file, self._path(fid))
+                return io.BytesIO(content), meta["content_type"]
+            except (OSError, ValueError):
+                self._forget(key)
+
+        return await self.storage.download(fid, name)
+
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> model.AsyncWeedDownloadStream:
+        key = self._key(fid)
+        if key in self._entries:
+            # Попадание отдаётся через FileResponse, Range он обрабатывает сам.
+            # Файл или его заголовки могли удалить снаружи — тогда читаем из storage
+            path = self._path(fid)
+            meta = self._load_meta(path)
+            if meta is not None and os.path.isfile(path):
+                self._entries.move_to_end(key)
+                return model.AsyncWeedDownloadStream(
+                    status_code=200,
+                    content_type=meta["content_type"],
+                    content_length=self._entries[key],
+                    headers={},
+                    chunks=self._iter_empty(),
+                    etag=meta.get("etag"),
+                    last_modified=meta.get("last_modified"),
+                    path=path,
+                )
+            self._forget(key)
+
+        file_stream = await self.storage.download_stream(fid, name, range_header, if_range)
+
+        # Кэшируем только полные ответы, которые помещаются в кэш
+        if (
+                self.enabled
+                and file_stream.status_code == 200
+                and file_stream.content_length is not None
+                and file_stream.content_length <= self.max_bytes
+        ):
+            meta = {
+                "content_type": file_stream.content_type,
+                "etag": file_stream.etag,
+                "last_modified": file_stream.last_modified,
+            }
+            file_stream.chunks = self._tee_to_cache(fid, file_stream.chunks, file_stream.content_length, meta)
+
+        return file_stream
+
+    async def delete(self, fid: str, name: str):
+        self._forget(self._key(fid))
+        return await self.storage.delete(fid, name)
+
+    async def update(self, file: io.BytesIO, fid: str, name: str):
+        self._forget(self._key(fid))
+        return await self.storage.update(file, fid, name)
+
+    async def _tee_to_cache(
+            self,
+            fid: str,
+            chunks: AsyncIterator[bytes],
+            expected_size: int,
+            meta: dict,
+    ) -> AsyncIterator[bytes]:
+        """Отдавать чанки клиенту и параллельно писать их во временный файл; в кэш он попадает через rename"""
+        final_path = self._path(fid)
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+
+        file = await asyncio.to_thread(open, tmp_path, "wb")
+        written = 0
+        completed = False
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(file.write, chunk)
+                written += len(chunk)
+                yield chunk
+            completed = True
+        finally:
+            # При обрыве клиента cancel scope отменяет и await в finally, поэтому файл
+            # закрывается и переносится/удаляется синхронно, до единственного await
+            file.close()
+            if completed and written == expected_size and self._write_meta(final_path, meta):
+                os.replace(tmp_path, final_path)
+                self._add(self._key(fid), written)
+            else:
+                self._unlink(tmp_path)
+
+            await chunks.aclose()
+
+    def _add(self, key: str, size: int) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous
+
+        self._entries[key] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._remove_file(key, size)
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._remove_file(key, size)
+
+    def _remove_file(self, key: str, size: int) -> None:
+        self._total_bytes -= size
+        path = os.path.join(self.cache_dir, key)
+        self._unlink(path)
+        self._unlink(path + META_SUFFIX)
+
+    def _write_meta(self, path: str, meta: dict) -> bool:
+        # Заголовки переносятся на место раньше файла: файл в кэше без заголовков не бывает
+        tmp_path = f"{path}{META_SUFFIX}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(meta, file)
+            os.replace(tmp_path, path + META_SUFFIX)
+            return True
+        except OSError as err:
+            self.logger.warning(f"Не удалось записать заголовки файла кэша {path}: {err}")
+            self._unlink(tmp_path)
+            return False
+
+    def _load_meta(self, path: str) -> dict | None:
+        try:
+            return self._read_meta(path)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _read_meta(path: str) -> dict:
+        with open(path + META_SUFFIX) as file:
+            meta = json.load(file)
+        if not isinstance(meta, dict) or not meta.get("content_type"):
+            raise ValueError(f"Повреждены заголовки файла кэша {path}")
+        return meta
+
+    def _unlink(self, path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            self.logger.warning(f"Не удалось удалить файл кэша {path}: {err}")
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+    @staticmethod
+    async def _iter_empty() -> AsyncIterator[bytes]:
+        return
+        yield
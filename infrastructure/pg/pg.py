@@ -1,57 +1,728 @@
-from collections.abc import Sequence
+import asyncio
+import itertools
+import re
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Sequence
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
 from typing import Any
 
-from sqlalchemy import text
+import asyncpg
+from opentelemetry import trace
+from opentelemetry.metrics import CallbackOptions, Observation
+from sqlalchemy import exc, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from internal import interface
 
 
-def NewPool(db_user, db_pass, db_host, db_port, db_name):
+def NewPool(
+        db_user,
+        db_pass,
+        db_host,
+        db_port,
+        db_name,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_timeout: float = 30,
+        pool_recycle: int = 300,
+):
     async_engine = create_async_engine(
         f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
         echo=False,
         future=True,
-        pool_size=15,
-        max_overflow=15,
-        pool_recycle=300,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
     )
 
     pool = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
     return pool
 
 
+PRIMARY_POOL = "primary"
+STREAM_BATCH_SIZE = 1000
+COPY_QUEUE_SIZE = 16
+LISTEN_RECONNECT_DELAY = 5
+LISTEN_HEALTHCHECK_INTERVAL = 30
+
+# :name вне приведения типов (::text); двоеточие-приставка не входит в имя параметра
+_PARAM_PATTERN = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+@lru_cache(maxsize=1024)
+def compile_query(query: str) -> tuple[str, tuple[str, ...]]:
+    """
+    Перевести :name в $n для asyncpg.
+    Запросы — константы из sql_query.py, поэтому разбор делается один раз на строку.
+    """
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAM_PATTERN.sub(replace, query), tuple(names)
+
+
+_QUERY_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def query_name(query: str) -> str:
+    """Имя запроса для метрик, когда нет span репозитория: глагол и первая таблица"""
+    verb = query.split(None, 1)[0].upper() if query.strip() else ""
+    match = _QUERY_TABLE_PATTERN.search(query)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def observed_query(operation: str):
+    """Записать длительность запроса в гистограмму db.query.duration"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, query, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(self, query, *args, **kwargs)
+            finally:
+                self._record_query_duration(operation, query, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+class Record(asyncpg.Record):
+    """Запись asyncpg с доступом к колонкам через атрибуты, как у Row SQLAlchemy"""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+# Отставание реплики в секундах; без новых WAL (реплика догнала primary) отставание нулевое
+replica_lag_query = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag;
+"""
+
+# Первый запрос сессии, после которого адаптер SQLAlchemy уже открыл транзакцию
+begin_transaction_query = "SELECT 1;"
+
+# Снимок для нескольких согласованных чтений; должен быть первым запросом транзакции
+snapshot_transaction_query = "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;"
+
+# Ошибки соединения, после которых реплика выводится из ротации
+REPLICA_CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    exc.OperationalError,
+    exc.InterfaceError,
+)
+
+
+class Replica:
+    def __init__(self, host: str, port: str, db_user, db_pass, db_name, **pool_options):
+        self.name = f"{host}:{port}"
+        self.pool = NewPool(db_user, db_pass, host, port, db_name, **pool_options)
+        self.dsn = f"postgresql://{db_user}:{db_pass}@{host}:{port}/{db_name}"
+        self.raw_pool: asyncpg.Pool | None = None
+
+        # В ротацию реплика попадает после первой проверки отставания
+        self.healthy = False
+        self.lag: float | None = None
+
+
 class PG(interface.IDB):
-    def __init__(self, tel: interface.ITelemetry, db_user, db_pass, db_host, db_port, db_name):
-        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name)
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            raw_asyncpg: bool = False,
+            statement_cache_size: int = 512,
+            replica_hosts: list[str] | None = None,
+            replica_max_lag: float = 5.0,
+            replica_check_interval: float = 5.0,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            pool_timeout: float = 30,
+            pool_recycle: int = 300,
+    ):
+        pool_options = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+        }
+        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name, **pool_options)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
         self.tracer = tel.tracer()
 
+        # Режим прямого asyncpg: без AsyncSession, компиляции text() и обёртки Result
+        self.raw_asyncpg = raw_asyncpg
+        self.statement_cache_size = statement_cache_size
+        self._dsn = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+        self._raw_pool: asyncpg.Pool | None = None
+        self._raw_pool_lock = asyncio.Lock()
+
+        # Реплики для select(); host или host:port, учётные данные те же, что у primary
+        self.logger = tel.logger()
+        self.replicas = [
+            Replica(*self._split_host(host, db_port), db_user, db_pass, db_name, **pool_options)
+            for host in (replica_hosts or [])
+        ]
+        self.replica_max_lag = replica_max_lag
+        self.replica_check_interval = replica_check_interval
+        self._replica_counter = itertools.count()
+        self._lag_monitor_task: asyncio.Task | None = None
+
+        # Сессия (или соединение asyncpg) открытой транзакции текущей задачи
+        self._transaction: ContextVar[Any] = ContextVar(f"pg_transaction_{id(self)}", default=None)
+
+        # Метрики пула: заполненность, ожидание соединения и длительность запросов
+        self.meter = tel.meter()
+        self._checkout_wait = self.meter.create_histogram(
+            "db.pool.checkout_wait",
+            unit="s",
+            description="Time spent waiting for a pooled connection",
+        )
+        self._query_duration = self.meter.create_histogram(
+            "db.query.duration",
+            unit="s",
+            description="Query latency by repository method or statement",
+        )
+        self.meter.create_observable_gauge(
+            "db.pool.connections.in_use",
+            callbacks=[self._observe_in_use],
+            description="Connections checked out of the pool",
+        )
+        self.meter.create_observable_gauge(
+            "db.pool.connections.idle",
+            callbacks=[self._observe_idle],
+            description="Open connections waiting in the pool",
+        )
+        self.meter.create_observable_gauge(
+            "db.pool.connections.overflow",
+            callbacks=[self._observe_overflow],
+            description="Connections opened above pool_size",
+        )
+        self.meter.create_observable_gauge(
+            "db.pool.connections.max",
+            callbacks=[self._observe_max],
+            description="Maximum connections the pool may open",
+        )
+
+    def _pools(self) -> list[tuple[str, Any, asyncpg.Pool | None]]:
+        pools = [(PRIMARY_POOL, self.pool, self._raw_pool)]
+        pools.extend((replica.name, replica.pool, replica.raw_pool) for replica in self.replicas)
+        return pools
+
+    def _observe_in_use(self, options: CallbackOptions) -> Iterable[Observation]:
+        for name, session_pool, raw_pool in self._pools():
+            if raw_pool is not None:
+                yield Observation(raw_pool.get_size() - raw_pool.get_idle_size(), {"pool": name, "driver": "asyncpg"})
+            yield Observation(session_pool.kw["bind"].pool.checkedout(), {"pool": name, "driver": "sqlalchemy"})
+
+    def _observe_idle(self, options: CallbackOptions) -> Iterable[Observation]:
+        for name, session_pool, raw_pool in self._pools():
+            if raw_pool is not None:
+                yield Observation(raw_pool.get_idle_size(), {"pool": name, "driver": "asyncpg"})
+            yield Observation(session_pool.kw["bind"].pool.checkedin(), {"pool": name, "driver": "sqlalchemy"})
+
+    def _observe_overflow(self, options: CallbackOptions) -> Iterable[Observation]:
+        for name, session_pool, _ in self._pools():
+            # QueuePool.overflow() отрицателен, пока пул не заполнен до pool_size
+            yield Observation(max(0, session_pool.kw["bind"].pool.overflow()), {"pool": name, "driver": "sqlalchemy"})
+
+    def _observe_max(self, options: CallbackOptions) -> Iterable[Observation]:
+        for name, _, raw_pool in self._pools():
+            if raw_pool is not None:
+                yield Observation(raw_pool.get_max_size(), {"pool": name, "driver": "asyncpg"})
+            yield Observation(self.pool_size + self.max_overflow, {"pool": name, "driver": "sqlalchemy"})
+
+    def _record_query_duration(self, operation: str, query: str, duration: float) -> None:
+        # Имя берём из span репозитория (AnalysisRepo.get_analyses), иначе из текста запроса
+        name = getattr(trace.get_current_span(), "name", None) or query_name(query)
+        self._query_duration.record(duration, {"db.operation": operation, "db.query": name})
+
+    @asynccontextmanager
+    async def _session(self, session_pool: Any, pool_name: str = PRIMARY_POOL) -> AsyncIterator[AsyncSession]:
+        async with session_pool() as session:
+            # Соединение берём сразу, чтобы измерить ожидание пула отдельно от запроса
+            started = time.perf_counter()
+            await session.connection()
+            self._checkout_wait.record(time.perf_counter() - started, {"pool": pool_name, "driver": "sqlalchemy"})
+            yield session
+
+    @asynccontextmanager
+    async def _acquire(
+            self,
+            raw_pool: asyncpg.Pool,
+            pool_name: str = PRIMARY_POOL,
+    ) -> AsyncIterator[asyncpg.Connection]:
+        started = time.perf_counter()
+        async with raw_pool.acquire(timeout=self.pool_timeout) as conn:
+            self._checkout_wait.record(time.perf_counter() - started, {"pool": pool_name, "driver": "asyncpg"})
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self, read_only: bool = False) -> AsyncIterator[None]:
+        """
+        Закрепить одно соединение за блоком вызовов репозиториев и закоммитить их один раз.
+        Вложенный transaction() присоединяется к внешнему. Запросы внутри идут последовательно:
+        одно соединение не выполняет два запроса одновременно.
+
+        read_only=True — снимок REPEATABLE READ READ ONLY на одной реплике (или на primary, если
+        реплик в ротации нет): все select() блока видят одни и те же данные.
+        """
+        if self._transaction.get() is not None:
+            yield
+            return
+
+        replica = self._pick_replica() if read_only else None
+        pool_name = replica.name if replica else PRIMARY_POOL
+
+        if self.raw_asyncpg:
+            raw_pool = await (self._get_replica_raw_pool(replica) if replica else self._get_raw_pool())
+            isolation = "repeatable_read" if read_only else None
+            async with self._acquire(raw_pool, pool_name) as conn:
+                async with conn.transaction(isolation=isolation, readonly=read_only):
+                    token = self._transaction.set(conn)
+                    try:
+                        yield
+                    finally:
+                        self._transaction.reset(token)
+            return
+
+        async with self._session(replica.pool if replica else self.pool, pool_name) as session:
+            if read_only:
+                await session.execute(text(snapshot_transaction_query))
+            token = self._transaction.set(session)
+            try:
+                yield
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                self._transaction.reset(token)
+
+    @asynccontextmanager
+    async def _driver_connection(self, replica: Replica | None = None) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Соединение asyncpg для bulk-операций: из открытой транзакции, raw-пула или движка SQLAlchemy.
+        replica — читать с реплики; внутри транзакции игнорируется
+        """
+        tx = self._transaction.get()
+        if tx is not None:
+            if self.raw_asyncpg:
+                yield tx
+            else:
+                raw_connection = await (await tx.connection()).get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                if not driver_connection.is_in_transaction():
+                    # Адаптер SQLAlchemy открывает BEGIN лениво, при первом запросе сессии.
+                    # Без него bulk-операция в начале блока закоммитилась бы сама и не откатилась
+                    await tx.execute(text(begin_transaction_query))
+                yield driver_connection
+            return
+
+        if self.raw_asyncpg:
+            pool = await (self._get_replica_raw_pool(replica) if replica else self._get_raw_pool())
+            async with self._acquire(pool, replica.name if replica else PRIMARY_POOL) as conn:
+                yield conn
+            return
+
+        session_pool = replica.pool if replica else self.pool
+        async with session_pool.kw["bind"].connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            yield raw_connection.driver_connection
+
+    async def _execute_in_transaction(self, tx: Any, query: str, query_params: dict) -> Sequence[Any] | None:
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            return await tx.fetch(sql, *args)
+
+        result = await tx.execute(text(query), query_params)
+        return result.all() if result.returns_rows else None
+
+    @staticmethod
+    def _split_host(host: str, default_port) -> tuple[str, str]:
+        host, _, port = host.strip().partition(":")
+        return host, port or str(default_port)
+
+    async def _create_raw_pool(self, dsn: str) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            dsn,
+            min_size=1,
+            max_size=self.pool_size + self.max_overflow,
+            max_inactive_connection_lifetime=self.pool_recycle,
+            statement_cache_size=self.statement_cache_size,
+            record_class=Record,
+        )
+
+    async def _get_raw_pool(self) -> asyncpg.Pool:
+        if self._raw_pool is None:
+            async with self._raw_pool_lock:
+                if self._raw_pool is None:
+                    self._raw_pool = await self._create_raw_pool(self._dsn)
+        return self._raw_pool
+
+    async def _get_replica_raw_pool(self, replica: Replica) -> asyncpg.Pool:
+        if replica.raw_pool is None:
+            async with self._raw_pool_lock:
+                if replica.raw_pool is None:
+                    replica.raw_pool = await self._create_raw_pool(replica.dsn)
+        return replica.raw_pool
+
+    def _pick_replica(self) -> Replica | None:
+        if not self.replicas:
+            return None
+
+        if self._lag_monitor_task is None:
+            self._lag_monitor_task = asyncio.create_task(self._monitor_replica_lag())
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+
+        return healthy[next(self._replica_counter) % len(healthy)]
+
+    async def _select_replica(self, replica: Replica, query: str, query_params: dict) -> Sequence[Any]:
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_replica_raw_pool(replica), replica.name) as conn:
+                return await conn.fetch(sql, *args)
+
+        async with self._session(replica.pool, replica.name) as session:
+            result = await session.execute(text(query), query_params)
+            return result.all()
+
+    async def _monitor_replica_lag(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+            await asyncio.sleep(self.replica_check_interval)
+
+    async def _check_replica(self, replica: Replica) -> None:
+        try:
+            rows = await asyncio.wait_for(
+                self._select_replica(replica, replica_lag_query, {}),
+                timeout=self.replica_check_interval,
+            )
+            replica.lag = float(rows[0][0])
+        except Exception as err:
+            replica.lag = None
+            self._set_replica_health(replica, False, f"проверка отставания не удалась: {err}")
+            return
+
+        if replica.lag > self.replica_max_lag:
+            self._set_replica_health(replica, False, f"отставание {replica.lag:.1f}с")
+        else:
+            self._set_replica_health(replica, True, f"отставание {replica.lag:.1f}с")
+
+    def _set_replica_health(self, replica: Replica, healthy: bool, reason: str) -> None:
+        if replica.healthy == healthy:
+            return
+
+        replica.healthy = healthy
+        if healthy:
+            self.logger.info(f"Реплика {replica.name} возвращена в ротацию: {reason}")
+        else:
+            self.logger.warning(f"Реплика {replica.name} выведена из ротации: {reason}")
+
+    @staticmethod
+    def _raw_args(query: str, query_params: dict) -> tuple[str, list[Any]]:
+        sql, names = compile_query(query)
+        return sql, [query_params[name] for name in names]
+
+    @observed_query("insert")
     async def insert(self, query: str, query_params: dict) -> int:
-        async with self.pool() as session:
+        tx = self._transaction.get()
+        if tx is not None:
+            rows = await self._execute_in_transaction(tx, query, query_params)
+            return rows[0][0]
+
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                return await conn.fetchval(sql, *args)
+
+        async with self._session(self.pool) as session:
             result = await session.execute(text(query), query_params)
             await session.commit()
             rows = result.all()
             return rows[0][0]
 
+    @observed_query("delete")
     async def delete(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
+        tx = self._transaction.get()
+        if tx is not None:
+            await self._execute_in_transaction(tx, query, query_params)
+            return
+
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                await conn.execute(sql, *args)
+            return
+
+        async with self._session(self.pool) as session:
             await session.execute(text(query), query_params)
             await session.commit()
 
+    @observed_query("update")
     async def update(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
+        tx = self._transaction.get()
+        if tx is not None:
+            await self._execute_in_transaction(tx, query, query_params)
+            return
+
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                await conn.execute(sql, *args)
+            return
+
+        async with self._session(self.pool) as session:
             await session.execute(text(query), query_params)
             await session.commit()
 
-    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
-        async with self.pool() as session:
+    @observed_query("select")
+    async def select(self, query: str, query_params: dict, use_primary: bool = False) -> Sequence[Any]:
+        tx = self._transaction.get()
+        if tx is not None:
+            return await self._execute_in_transaction(tx, query, query_params)
+
+        replica = None if use_primary else self._pick_replica()
+        if replica is not None:
+            try:
+                return await self._select_replica(replica, query, query_params)
+            except REPLICA_CONNECTION_ERRORS as err:
+                # Упавшую реплику убираем до следующей успешной проверки и читаем с primary
+                self._set_replica_health(replica, False, f"ошибка соединения: {err}")
+
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                return await conn.fetch(sql, *args)
+
+        async with self._session(self.pool) as session:
             result = await session.execute(text(query), query_params)
             rows = result.all()
             return rows
 
-    async def multi_query(self, queries: list[str]) -> None:
-        async with self.pool() as session:
+    @observed_query("execute_returning")
+    async def execute_returning(self, query: str, query_params: dict) -> Sequence[Any]:
+        tx = self._transaction.get()
+        if tx is not None:
+            return await self._execute_in_transaction(tx, query, query_params)
+
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                return await conn.fetch(sql, *args)
+
+        async with self._session(self.pool) as session:
+            result = await session.execute(text(query), query_params)
+            rows = result.all()
+            await session.commit()
+            return rows
+
+    async def multi_query(self, queries: list[str], autocommit: bool = False) -> None:
+        if self.raw_asyncpg:
+            async with self._acquire(await self._get_raw_pool()) as conn:
+                if autocommit:
+                    for query in queries:
+                        await conn.execute(query)
+                else:
+                    async with conn.transaction():
+                        for query in queries:
+                            await conn.execute(query)
+            return None
+
+        if autocommit:
+            # Вне транзакции: так выполняются CREATE/DROP INDEX CONCURRENTLY
+            async with self.pool.kw["bind"].connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                for query in queries:
+                    await conn.execute(text(query))
+            return None
+
+        async with self._session(self.pool) as session:
             for query in queries:
                 await session.execute(text(query))
             await session.commit()
         return None
+
+    async def stream(
+            self,
+            query: str,
+            query_params: dict,
+            batch_size: int = STREAM_BATCH_SIZE,
+            use_primary: bool = False,
+    ) -> AsyncIterator[Sequence[Any]]:
+        """
+        Строки серверным курсором пачками по batch_size: в памяти не больше одной пачки.
+        Длинные выгрузки по умолчанию читаются с реплики.
+        """
+        tx = self._transaction.get()
+        if tx is not None:
+            async for rows in self._stream_rows(tx, query, query_params, batch_size):
+                yield rows
+            return
+
+        replica = None if use_primary else self._pick_replica()
+
+        if self.raw_asyncpg:
+            pool = await (self._get_replica_raw_pool(replica) if replica else self._get_raw_pool())
+            async with self._acquire(pool, replica.name if replica else PRIMARY_POOL) as conn:
+                # Курсор asyncpg живёт только внутри транзакции
+                async with conn.transaction():
+                    async for rows in self._stream_rows(conn, query, query_params, batch_size):
+                        yield rows
+            return
+
+        session_pool = replica.pool if replica else self.pool
+        async with self._session(session_pool, replica.name if replica else PRIMARY_POOL) as session:
+            async for rows in self._stream_rows(session, query, query_params, batch_size):
+                yield rows
+
+    async def _stream_rows(
+            self,
+            conn: Any,
+            query: str,
+            query_params: dict,
+            batch_size: int,
+    ) -> AsyncIterator[Sequence[Any]]:
+        if self.raw_asyncpg:
+            sql, args = self._raw_args(query, query_params)
+            cursor = await conn.cursor(sql, *args)
+            while rows := await cursor.fetch(batch_size):
+                yield rows
+            return
+
+        result = await conn.stream(text(query), query_params, execution_options={"yield_per": batch_size})
+        async for rows in result.partitions(batch_size):
+            yield rows
+
+    @observed_query("executemany")
+    async def copy_from(
+            self,
+            table: str,
+            columns: Sequence[str],
+            records: Iterable[Sequence[Any]] | AsyncIterable[Sequence[Any]],
+    ) -> int:
+        """COPY FROM STDIN в бинарном формате; возвращает число загруженных строк"""
+        async with self._driver_connection() as conn:
+            status = await conn.copy_records_to_table(table, records=records, columns=list(columns))
+
+        return int(status.split()[-1])
+
+    async def copy_to(
+            self,
+            query: str,
+            query_params: dict | None = None,
+            copy_format: str = "csv",
+            use_primary: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        COPY (query) TO STDOUT потоком чанков; query — без завершающей точки с запятой.
+        Очередь ограничена, поэтому COPY не читает из базы быстрее, чем потребитель отдаёт данные.
+        Как и stream(), длинные выгрузки по умолчанию читаются с реплики.
+        """
+        sql, args = self._raw_args(query, query_params or {})
+        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=COPY_QUEUE_SIZE)
+        replica = None if use_primary or self._transaction.get() is not None else self._pick_replica()
+
+        async with self._driver_connection(replica) as conn:
+            copy_task = asyncio.create_task(
+                conn.copy_from_query(
+                    sql,
+                    *args,
+                    output=queue.put,
+                    format=copy_format,
+                    header=copy_format == "csv",
+                )
+            )
+            try:
+                while True:
+                    get_task = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait({get_task, copy_task}, return_when=asyncio.FIRST_COMPLETED)
+                    if get_task in done:
+                        yield get_task.result()
+                        continue
+
+                    get_task.cancel()
+                    while not queue.empty():
+                        yield queue.get_nowait()
+
+                    # Пробрасываем ошибку COPY, если она была
+                    copy_task.result()
+                    break
+            finally:
+                if not copy_task.done():
+                    copy_task.cancel()
+                    try:
+                        await copy_task
+                    except asyncio.CancelledError:
+                        pass
+
+    async def listen(
+            self,
+            channel: str,
+            callback: Callable[[str], None],
+            on_reconnect: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Держать отдельное от пула соединение с LISTEN channel и передавать payload уведомлений в callback.
+        После обрыва соединение переоткрывается; уведомления за время обрыва потеряны, об этом сообщает on_reconnect.
+        """
+        connected_before = False
+        while True:
+            try:
+                conn = await asyncpg.connect(self._dsn)
+            except Exception as err:
+                self.logger.warning(f"LISTEN {channel}: не удалось подключиться: {err}")
+                await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+                continue
+
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            try:
+                await conn.add_listener(channel, lambda _conn, _pid, _channel, payload: callback(payload))
+                if connected_before and on_reconnect is not None:
+                    on_reconnect()
+                connected_before = True
+
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=LISTEN_HEALTHCHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # Без трафика обрыв TCP может остаться незамеченным — проверяем соединение сами
+                        await asyncio.wait_for(conn.execute("SELECT 1"), timeout=LISTEN_RECONNECT_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self.logger.warning(f"LISTEN {channel}: соединение потеряно: {err}")
+            finally:
+                if not conn.is_closed():
+                    conn.terminate()
+
+            await asyncio.sleep(LISTEN_RECONNECT_DELAY)
@@ -1,19 +1,78 @@
 import io
+import time
 import asyncio
-from typing import Optional, Tuple
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import BinaryIO, Optional, Tuple
 
 import aiohttp
 from aiohttp import ClientSession
 
 from internal import interface, model
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Доля TTL, после которой запись кэша volume обновляется в фоне
+VOLUME_CACHE_REFRESH_RATIO = 0.8
+# Чтение с реплик: сглаживание задержки, пауза после сбоя, объём статистики для p95
+REPLICA_LATENCY_EWMA_ALPHA = 0.2
+REPLICA_FAILURE_COOLDOWN = 30
+READ_LATENCY_WINDOW = 512
+HEDGE_MIN_SAMPLES = 20
+
 
 class AsyncWeed(interface.IStorage):
-    def __init__(self, weed_master_host: str, weed_master_port: int, timeout: int = 30):
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            weed_master_host: str,
+            weed_master_port: int,
+            timeout: int = 30,
+            volume_cache_ttl: int = 300,
+            volume_cache_size: int = 1024,
+            fid_batch_size: int = 16,
+            fid_low_water: int = 4,
+            fid_lease_ttl: int = 60,
+            hedged_reads: bool = False,
+            hedge_min_delay: float = 0.05,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
         self.master_url = f"http://{weed_master_host}:{weed_master_port}"
         self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # Для потоковой передачи ограничиваем не весь запрос, а простой сокета
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
         self._session: Optional[ClientSession] = None
 
+        # Кэш volume_id -> (время загрузки, locations) с LRU-вытеснением
+        self.volume_cache_ttl = volume_cache_ttl
+        self.volume_cache_size = volume_cache_size
+        self._volume_cache: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._volume_lookup_tasks: dict[str, asyncio.Task] = {}
+
+        # Пул заранее выданных master'ом fid: (время выдачи, {'fid', 'url'})
+        self.fid_batch_size = fid_batch_size
+        self.fid_low_water = fid_low_water
+        self.fid_lease_ttl = fid_lease_ttl
+        self._fid_pool: deque[tuple[float, dict]] = deque()
+        self._fid_refill_task: Optional[asyncio.Task] = None
+
+        # Статистика чтения с реплик
+        self.hedged_reads = hedged_reads
+        self.hedge_min_delay = hedge_min_delay
+        self._replica_latency: dict[str, float] = {}
+        self._replica_failed_until: dict[str, float] = {}
+        self._read_latencies: deque[float] = deque(maxlen=READ_LATENCY_WINDOW)
+
+        self._volume_cache_hits = self.meter.create_counter(
+            "weedfs.volume_cache.hits",
+            description="Volume location lookups served from the in-process cache",
+        )
+        self._volume_cache_misses = self.meter.create_counter(
+            "weedfs.volume_cache.misses",
+            description="Volume location lookups that went to the SeaweedFS master",
+        )
+
     async def _get_session(self) -> ClientSession:
         """Получить или создать HTTP сессию"""
         if self._session is None or self._session.closed:
@@ -21,13 +80,68 @@ class AsyncWeed(interface.IStorage):
         return self._session
 
     async def _assign_file_key(self) -> dict:
-        """Получить ключ для загрузки файла"""
+        """Получить ключ для загрузки файла из пула, пополняя его пачками"""
+        if self.fid_batch_size <= 1:
+            return (await self._assign_file_keys(1))[0]
+
+        while True:
+            lease = self._take_fid_lease()
+            if lease is not None:
+                break
+            await asyncio.shield(self._refill_fid_pool())
+
+        # Пополняем пул в фоне заранее, чтобы master не попадал в критический путь загрузки
+        if len(self._fid_pool) < self.fid_low_water:
+            self._refill_fid_pool()
+
+        return lease
+
+    def _take_fid_lease(self) -> Optional[dict]:
+        """Взять свежий fid из пула, выбрасывая просроченные"""
+        now = time.monotonic()
+        while self._fid_pool:
+            assigned_at, lease = self._fid_pool.popleft()
+            if now - assigned_at < self.fid_lease_ttl:
+                return lease
+        return None
+
+    def _refill_fid_pool(self) -> asyncio.Task:
+        """Запустить пополнение пула, если оно ещё не идёт"""
+        if self._fid_refill_task is not None and not self._fid_refill_task.done():
+            return self._fid_refill_task
+
+        async def _refill():
+            leases = await self._assign_file_keys(self.fid_batch_size)
+            assigned_at = time.monotonic()
+            self._fid_pool.extend((assigned_at, lease) for lease in leases)
+
+        def _on_done(done_task: asyncio.Task):
+            if not done_task.cancelled() and done_task.exception() is not None:
+                self.logger.warning(f"Не удалось пополнить пул fid: {done_task.exception()}")
+
+        self._fid_refill_task = asyncio.create_task(_refill())
+        self._fid_refill_task.add_done_callback(_on_done)
+        return self._fid_refill_task
+
+    async def _assign_file_keys(self, count: int) -> list[dict]:
+        """Получить у master пачку ключей для загрузки"""
         session = await self._get_session()
 
-        async with session.get(f"{self.master_url}/dir/assign") as response:
+        async with session.get(f"{self.master_url}/dir/assign", params={"count": count}) as response:
             if response.status != 200:
                 raise Exception(f"Failed to assign file key: {response.status}")
-            return await response.json()
+            assign_result = await response.json()
+
+        if assign_result.get('error'):
+            raise Exception(f"Failed to assign file key: {assign_result['error']}")
+
+        # При count=N master резервирует fid, fid_1, ..., fid_{N-1} на одном volume
+        fid = assign_result['fid']
+        assigned = int(assign_result.get('count') or 1)
+        return [
+            {'fid': fid if i == 0 else f"{fid}_{i}", 'url': assign_result['url']}
+            for i in range(assigned)
+        ]
 
     async def _lookup_volume(self, volume_id: str) -> dict:
         """Найти volume по ID"""
@@ -38,6 +152,63 @@ class AsyncWeed(interface.IStorage):
                 raise Exception(f"Failed to lookup volume: {response.status}")
             return await response.json()
 
+    async def _get_volume_locations(self, volume_id: str) -> list[dict]:
+        """Получить locations volume из кэша, при промахе — у master"""
+        cached = self._volume_cache.get(volume_id)
+        if cached is not None:
+            cached_at, locations = cached
+            age = time.monotonic() - cached_at
+            if age < self.volume_cache_ttl:
+                self._volume_cache.move_to_end(volume_id)
+                self._volume_cache_hits.add(1)
+
+                # Обновляем запись заранее, чтобы горячие volume не выпадали из кэша
+                if age >= self.volume_cache_ttl * VOLUME_CACHE_REFRESH_RATIO:
+                    self._volume_lookup_task(volume_id)
+                return locations
+
+            self._volume_cache.pop(volume_id, None)
+
+        self._volume_cache_misses.add(1)
+        return await asyncio.shield(self._volume_lookup_task(volume_id))
+
+    def _volume_lookup_task(self, volume_id: str) -> asyncio.Task:
+        """Один lookup на volume, сколько бы запросов его ни ждали"""
+        task = self._volume_lookup_tasks.get(volume_id)
+        if task is not None and not task.done():
+            return task
+
+        task = asyncio.create_task(self._load_volume_locations(volume_id))
+        self._volume_lookup_tasks[volume_id] = task
+
+        def _on_done(done_task: asyncio.Task):
+            if self._volume_lookup_tasks.get(volume_id) is done_task:
+                del self._volume_lookup_tasks[volume_id]
+            if not done_task.cancelled() and done_task.exception() is not None:
+                self.logger.warning(f"Не удалось обновить locations volume {volume_id}: {done_task.exception()}")
+
+        task.add_done_callback(_on_done)
+        return task
+
+    async def _load_volume_locations(self, volume_id: str) -> list[dict]:
+        """Запросить locations у master и положить в кэш"""
+        lookup_result = await self._lookup_volume(volume_id)
+        if 'locations' not in lookup_result or not lookup_result['locations']:
+            self._invalidate_volume(volume_id)
+            raise Exception(f"Volume {volume_id} not found")
+
+        locations = lookup_result['locations']
+        self._volume_cache[volume_id] = (time.monotonic(), locations)
+        self._volume_cache.move_to_end(volume_id)
+        while len(self._volume_cache) > self.volume_cache_size:
+            self._volume_cache.popitem(last=False)
+
+        return locations
+
+    def _invalidate_volume(self, volume_id: str) -> None:
+        """Сбросить запись кэша после ошибки соединения или 404 от volume-сервера"""
+        self._volume_cache.pop(volume_id, None)
+
     def _parse_fid(self, fid: str) -> Tuple[str, str]:
         """Разобрать FID на volume_id и file_key"""
         if ',' not in fid:
@@ -80,50 +251,296 @@ class AsyncWeed(interface.IStorage):
                     size=len(file_data)
                 )
 
+        except aiohttp.ClientConnectionError as e:
+            # Volume-сервер недоступен: выданные на него fid больше не годятся
+            self._fid_pool.clear()
+            raise Exception(f"Failed to upload file: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to upload file: {str(e)}")
 
-    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+    async def upload_stream(
+            self,
+            stream: AsyncIterable[bytes] | BinaryIO,
+            name: str,
+    ) -> model.AsyncWeedOperationResponse:
+        """Потоково загрузить файл в SeaweedFS без буферизации целиком в памяти"""
         try:
-            volume_id, file_key = self._parse_fid(fid)
+            assign_result = await self._assign_file_key()
+            fid = assign_result['fid']
+            upload_url = f"http://{assign_result['url']}/{fid}"
 
-            # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
+            uploaded_size = 0
 
-            volume_server = lookup_result['locations'][0]['url']
-            download_url = f"http://{volume_server}/{fid}"
-
-            if name:
-                download_url += f"?filename={name}"
+            async def chunks() -> AsyncIterator[bytes]:
+                nonlocal uploaded_size
+                async for chunk in self._iter_chunks(stream):
+                    uploaded_size += len(chunk)
+                    yield chunk
 
             session = await self._get_session()
 
-            # Скачиваем файл
-            async with session.get(download_url) as response:
+            # Размер заранее неизвестен, поэтому тело уходит chunked multipart'ом
+            data = aiohttp.FormData()
+            data.add_field('file', chunks(), filename=name, content_type='application/octet-stream')
+
+            async with session.post(upload_url, data=data, timeout=self.stream_timeout) as response:
+                content = await response.read()
+
+                if response.status not in [200, 201]:
+                    raise Exception(f"Upload failed: {response.status}, {content.decode()}")
+
+                return model.AsyncWeedOperationResponse(
+                    status_code=response.status,
+                    content=content,
+                    content_type=response.headers.get('Content-Type', ''),
+                    headers=dict(response.headers),
+                    fid=fid,
+                    url=upload_url,
+                    size=uploaded_size
+                )
+
+        except aiohttp.ClientConnectionError as e:
+            self._fid_pool.clear()
+            raise Exception(f"Failed to upload file: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
+
+    async def _iter_chunks(self, stream: AsyncIterable[bytes] | BinaryIO) -> AsyncIterator[bytes]:
+        """Читать источник по частям: async-итератор или файловый объект (например, UploadFile.file)"""
+        if isinstance(stream, AsyncIterable):
+            async for chunk in stream:
+                if chunk:
+                    yield chunk
+            return
+
+        await asyncio.to_thread(stream.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(stream.read, UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+        try:
+            volume_id, file_key = self._parse_fid(fid)
+
+            # Находим volume
+            locations = await self._get_volume_locations(volume_id)
+            download_path = f"{fid}?filename={name}" if name else fid
+
+            # Скачиваем файл с самой быстрой доступной реплики
+            response = await self._open_read(volume_id, locations, download_path, {})
+            try:
                 if response.status != 200:
                     raise Exception(f"Download failed: {response.status}")
 
                 content = await response.read()
                 content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            finally:
+                response.release()
 
-                file_obj = io.BytesIO(content)
-                return file_obj, content_type
+            file_obj = io.BytesIO(content)
+            return file_obj, content_type
 
         except Exception as e:
             raise Exception(f"Failed to download file: {str(e)}")
 
-    async def delete(self, fid: str, name: str) -> model.AsyncWeedOperationResponse:
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> model.AsyncWeedDownloadStream:
+        """Скачать файл потоком: ответ volume-сервера остаётся открытым, пока читаются чанки"""
         try:
             volume_id, file_key = self._parse_fid(fid)
 
             # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
+            locations = await self._get_volume_locations(volume_id)
+            download_path = f"{fid}?filename={name}" if name else fid
+
+            # Range пробрасываем на volume-сервер, чтобы через backend шли только нужные байты
+            request_headers = {}
+            if range_header:
+                request_headers['Range'] = range_header
+                if if_range:
+                    request_headers['If-Range'] = if_range
+
+            response = await self._open_read(volume_id, locations, download_path, request_headers)
+
+            # Если volume-сервер не поддержал If-Range сам, проверяем валидатор здесь
+            if response.status == 206 and if_range and not self._if_range_matches(if_range, response):
+                response.release()
+                response = await self._open_read(volume_id, locations, download_path, {})
+
+        except Exception as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+
+        content_length = response.headers.get('Content-Length')
+
+        # У 416 тела нет: соединение отпускаем сразу
+        if response.status == 416:
+            response.release()
+            chunks = self._iter_empty()
+        else:
+            chunks = self._iter_response(response)
+
+        return model.AsyncWeedDownloadStream(
+            status_code=response.status,
+            content_type=response.headers.get('Content-Type', 'application/octet-stream'),
+            content_length=int(content_length) if content_length else None,
+            headers=dict(response.headers),
+            chunks=chunks,
+            content_range=response.headers.get('Content-Range'),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+    async def _open_read(
+            self,
+            volume_id: str,
+            locations: list[dict],
+            download_path: str,
+            request_headers: dict,
+    ) -> aiohttp.ClientResponse:
+        """
+        Открыть ответ одной из реплик без чтения тела.
+        Реплики перебираются по наблюдаемой задержке, при ошибке — переход к следующей.
+        В режиме хеджирования, если первая реплика не ответила за p95, запрос дублируется на следующую.
+        """
+        servers = self._order_replicas(locations)
+        hedge_delay = self._hedge_delay() if self.hedged_reads else None
+
+        tasks: list[asyncio.Task] = []
+        winner: Optional[aiohttp.ClientResponse] = None
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch():
+            server = servers.pop(0)
+            tasks.append(asyncio.create_task(self._request_replica(server, download_path, request_headers)))
+
+        launch()
+        try:
+            while True:
+                pending = {task for task in tasks if not task.done()}
+                timeout = hedge_delay if (hedge_delay is not None and not hedged and servers) else None
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Первая реплика тормозит — отправляем запрос на следующую
+                    hedged = True
+                    launch()
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        winner = task.result()
+                        return winner
+                    last_error = task.exception()
+
+                if all(task.done() for task in tasks):
+                    if not servers:
+                        self._invalidate_volume(volume_id)
+                        raise last_error
+                    launch()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    task.add_done_callback(self._release_response_task)
+                elif not task.cancelled() and task.exception() is None and task.result() is not winner:
+                    task.result().release()
+
+    async def _request_replica(
+            self,
+            server: str,
+            download_path: str,
+            request_headers: dict,
+    ) -> aiohttp.ClientResponse:
+        """Запросить файл у конкретной реплики, записав её задержку или сбой"""
+        session = await self._get_session()
+
+        started_at = time.monotonic()
+        try:
+            response = await session.get(
+                f"http://{server}/{download_path}", headers=request_headers, timeout=self.stream_timeout
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._replica_failed_until[server] = time.monotonic() + REPLICA_FAILURE_COOLDOWN
+            raise
+
+        if response.status not in [200, 206, 416]:
+            response.release()
+            # 404 — файла на реплике нет, это не повод понижать сервер
+            if response.status >= 500:
+                self._replica_failed_until[server] = time.monotonic() + REPLICA_FAILURE_COOLDOWN
+            raise Exception(f"Download failed: {response.status}")
+
+        self._record_read_latency(server, time.monotonic() - started_at)
+        return response
+
+    def _order_replicas(self, locations: list[dict]) -> list[str]:
+        """Упорядочить реплики: сначала недавно не падавшие, затем по EWMA задержки"""
+        now = time.monotonic()
+        servers = [location['url'] for location in locations]
+        return sorted(
+            servers,
+            key=lambda server: (
+                self._replica_failed_until.get(server, 0) > now,
+                self._replica_latency.get(server, 0.0),
+            ),
+        )
+
+    def _record_read_latency(self, server: str, latency: float) -> None:
+        previous = self._replica_latency.get(server)
+        if previous is None:
+            self._replica_latency[server] = latency
+        else:
+            self._replica_latency[server] = previous + REPLICA_LATENCY_EWMA_ALPHA * (latency - previous)
+        self._replica_failed_until.pop(server, None)
+        self._read_latencies.append(latency)
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Задержка перед хеджированием: p95 времени ответа, пока статистики мало — без хеджирования"""
+        if len(self._read_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._read_latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        return max(p95, self.hedge_min_delay)
+
+    @staticmethod
+    def _release_response_task(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is None:
+            task.result().release()
+
+    def _if_range_matches(self, if_range: str, response: aiohttp.ClientResponse) -> bool:
+        """Проверить If-Range: сильное сравнение ETag либо точное совпадение Last-Modified"""
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            etag = response.headers.get('ETag')
+            return bool(etag) and not if_range.startswith('W/') and not etag.startswith('W/') and etag == if_range
+        return response.headers.get('Last-Modified') == if_range
+
+    async def _iter_response(self, response: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        """Отдавать тело ответа по мере чтения клиентом и освободить соединение в конце"""
+        try:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release()
+
+    async def _iter_empty(self) -> AsyncIterator[bytes]:
+        return
+        yield
 
-            volume_server = lookup_result['locations'][0]['url']
+    async def delete(self, fid: str, name: str) -> model.AsyncWeedOperationResponse:
+        try:
+            volume_id, file_key = self._parse_fid(fid)
+
+            # Находим volume
+            locations = await self._get_volume_locations(volume_id)
+            volume_server = locations[0]['url']
             delete_url = f"http://{volume_server}/{fid}"
 
             if name:
@@ -136,6 +553,8 @@ class AsyncWeed(interface.IStorage):
                 content = await response.read()
 
                 if response.status not in [200, 202, 204]:
+                    if response.status == 404:
+                        self._invalidate_volume(volume_id)
                     raise Exception(f"Delete failed: {response.status}, {content.decode()}")
 
                 return model.AsyncWeedOperationResponse(
@@ -146,6 +565,9 @@ class AsyncWeed(interface.IStorage):
                     fid=fid
                 )
 
+        except aiohttp.ClientConnectionError as e:
+            self._invalidate_volume(volume_id)
+            raise Exception(f"Failed to delete file: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to delete file: {str(e)}")
 
@@ -155,11 +577,8 @@ class AsyncWeed(interface.IStorage):
             volume_id, file_key = self._parse_fid(fid)
 
             # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
-
-            volume_server = lookup_result['locations'][0]['url']
+            locations = await self._get_volume_locations(volume_id)
+            volume_server = locations[0]['url']
             update_url = f"http://{volume_server}/{fid}"
 
             # Подготавливаем данные для обновления
@@ -177,6 +596,8 @@ class AsyncWeed(interface.IStorage):
                 content = await response.read()
 
                 if response.status not in [200, 201]:
+                    if response.status == 404:
+                        self._invalidate_volume(volume_id)
                     raise Exception(f"Update failed: {response.status}, {content.decode()}")
 
                 return model.AsyncWeedOperationResponse(
@@ -189,6 +610,9 @@ class AsyncWeed(interface.IStorage):
                     size=len(file_data)
                 )
 
+        except aiohttp.ClientConnectionError as e:
+            self._invalidate_volume(volume_id)
+            raise Exception(f"Failed to update file: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to update file: {str(e)}")
 
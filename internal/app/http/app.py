@@ -109,6 +109,14 @@ def include_analysis_handlers(
         tags=["Analysis"],
     )
 
+    # Взять следующий анализ из очереди (врачи)
+    app.add_api_route(
+        prefix + "/analysis/claim-next",
+        analysis_controller.claim_next_analysis,
+        methods=["POST"],
+        tags=["Analysis"],
+    )
+
     # Отклонить анализ (врачи)
     app.add_api_route(
         prefix + "/analysis/reject",
@@ -141,6 +149,30 @@ def include_analysis_handlers(
         tags=["Analysis"],
     )
 
+    # Потоковая выгрузка анализов в NDJSON/CSV (врачи)
+    app.add_api_route(
+        prefix + "/analysis/export",
+        analysis_controller.export_analyses,
+        methods=["GET"],
+        tags=["Analysis"],
+    )
+
+    # Изменения анализов после водяного знака (дельта-синхронизация)
+    app.add_api_route(
+        prefix + "/analysis/changes",
+        analysis_controller.get_analysis_changes,
+        methods=["GET"],
+        tags=["Analysis"],
+    )
+
+    # Live-обновления анализов через SSE (врачи — все, медсёстры — свои)
+    app.add_api_route(
+        prefix + "/analysis/events",
+        analysis_controller.analysis_events,
+        methods=["GET"],
+        tags=["Analysis"],
+    )
+
     # Скачать файл study (врачи)
     app.add_api_route(
         prefix + "/analysis/study/{aid}",
@@ -53,6 +53,32 @@ class ErrAnalysisUnauthorized(Exception):
         return "Unauthorized to access this analysis"
 
 
+class ErrInvalidCursor(Exception):
+    def __str__(self):
+        return "Invalid pagination cursor"
+
+
 class ErrFileUploadFailed(Exception):
     def __str__(self):
         return "Failed to upload file"
+
+
+class ErrIdempotencyKeyInFlight(Exception):
+    def __str__(self):
+        return "Request with this Idempotency-Key is still in progress"
+
+
+class ErrIdempotencyKeyReused(Exception):
+    def __str__(self):
+        return "Idempotency-Key was already used for a different request"
+
+
+class ErrDuplicateAccountLogins(Exception):
+    def __init__(self, logins: list[str]):
+        self.logins = logins
+
+    def __str__(self):
+        return (
+            "Unique login index cannot be built, duplicate logins exist: "
+            f"{', '.join(self.logins)}. Merge or rename these accounts and rerun migrations"
+        )
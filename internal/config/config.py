@@ -18,6 +18,17 @@ class Config:
         self.db_name = os.getenv("EMU_BACKEND_POSTGRES_DB_NAME", "hr_interview")
         self.db_user = os.getenv("EMU_BACKEND_POSTGRES_USER", "postgres")
         self.db_pass = os.getenv("EMU_BACKEND_POSTGRES_PASSWORD", "password")
+        self.db_pool_size = int(os.getenv("EMU_BACKEND_POSTGRES_POOL_SIZE", "15"))
+        self.db_pool_max_overflow = int(os.getenv("EMU_BACKEND_POSTGRES_POOL_MAX_OVERFLOW", "15"))
+        self.db_pool_timeout = float(os.getenv("EMU_BACKEND_POSTGRES_POOL_TIMEOUT", "30"))
+        self.db_pool_recycle = int(os.getenv("EMU_BACKEND_POSTGRES_POOL_RECYCLE", "300"))
+        self.db_raw_asyncpg = os.getenv("EMU_BACKEND_POSTGRES_RAW_ASYNCPG", "false").lower() == "true"
+        self.db_statement_cache_size = int(os.getenv("EMU_BACKEND_POSTGRES_STATEMENT_CACHE_SIZE", "512"))
+        self.db_replica_hosts = [
+            host for host in os.getenv("EMU_BACKEND_POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()
+        ]
+        self.db_replica_max_lag = float(os.getenv("EMU_BACKEND_POSTGRES_REPLICA_MAX_LAG", "5"))
+        self.db_replica_check_interval = float(os.getenv("EMU_BACKEND_POSTGRES_REPLICA_CHECK_INTERVAL", "5"))
 
         # Настройки мониторинга и алертов
         self.alert_tg_bot_token = os.getenv("EMU_ALERT_TG_BOT_TOKEN", "")
@@ -42,7 +53,28 @@ class Config:
         # Настройки JWT
         self.jwt_secret_key = os.getenv("EMU_JWT_SECRET_KEY", "default-jwt-secret-key-change-me")
         self.interserver_secret_key = os.getenv("EMU_INTERSERVER_SECRET_KEY", "default-jwt-secret-key-change-me")
+        # local — токен проверяется в процессе, remote — каждый запрос ходит в /check-authorization
+        self.auth_verify_mode = os.getenv("EMU_AUTH_VERIFY_MODE", "local")
 
         # Настройки WeedFS (для хранения файлов)
         self.weedfs_host = os.getenv("EMU_WEED_MASTER_CONTAINER_NAME", "localhost")
         self.weedfs_port = os.getenv("EMU_WEED_MASTER_PORT", "9333")
+        self.weedfs_volume_cache_ttl = int(os.getenv("EMU_WEED_VOLUME_CACHE_TTL", "300"))
+        self.weedfs_volume_cache_size = int(os.getenv("EMU_WEED_VOLUME_CACHE_SIZE", "1024"))
+        self.weedfs_fid_batch_size = int(os.getenv("EMU_WEED_FID_BATCH_SIZE", "16"))
+        self.weedfs_fid_low_water = int(os.getenv("EMU_WEED_FID_LOW_WATER", "4"))
+        self.weedfs_fid_lease_ttl = int(os.getenv("EMU_WEED_FID_LEASE_TTL", "60"))
+        self.weedfs_hedged_reads = os.getenv("EMU_WEED_HEDGED_READS", "false").lower() == "true"
+        self.weedfs_hedge_min_delay = int(os.getenv("EMU_WEED_HEDGE_MIN_DELAY_MS", "50")) / 1000
+
+        # Ключи идемпотентности для загрузок
+        self.idempotency_key_ttl = int(os.getenv("EMU_IDEMPOTENCY_KEY_TTL", "86400"))
+        # Захват продлевается, пока операция идёт, поэтому TTL не ограничивает длительность загрузки:
+        # это время, через которое ключ освобождается, если процесс-владелец упал
+        self.idempotency_lock_ttl = int(os.getenv("EMU_IDEMPOTENCY_LOCK_TTL", "300"))
+        self.idempotency_wait_timeout = int(os.getenv("EMU_IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+
+        # Локальный дисковый кэш файлов, пустой путь — кэш выключен.
+        # Кэш однопроцессный: лимит и индекс считаются в памяти процесса, каталог захватывается одним воркером
+        self.disk_cache_dir = os.getenv("EMU_DISK_CACHE_DIR", "")
+        self.disk_cache_max_bytes = int(os.getenv("EMU_DISK_CACHE_MAX_MB", "2048")) * 1024 * 1024
@@ -1,15 +1,40 @@
-from fastapi import Request, UploadFile, Form
-from fastapi.responses import JSONResponse, StreamingResponse
+import hashlib
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import Query, Request, UploadFile, Form
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from urllib.parse import quote
 
-from internal import interface
+from internal import common, interface, model
 from internal.controller.http.handler.analysis.model import (
+    ClaimNextAnalysisBody,
     TakeAnalysisBody,
     RejectAnalysisBody,
 )
 from pkg.log_wrapper import auto_log
 from pkg.trace_wrapper import traced_method
 
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+SSE_KEEPALIVE_INTERVAL = 15
+# Списки кэшируются только у клиента и всегда перепроверяются через If-None-Match
+LIST_CACHE_CONTROL = "private, no-cache"
+
+
+def request_fingerprint(request: Request, fields: dict) -> str:
+    """
+    Отпечаток запроса для Idempotency-Key: метод, путь и поля формы.
+    Файл представлен именем, размером и типом — содержимое уже лежит на диске и не перечитывается.
+    """
+    values = {
+        name: [value.filename, value.size, value.content_type] if isinstance(value, UploadFile) else value
+        for name, value in fields.items()
+    }
+    payload = json.dumps([request.method, request.url.path, values], sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
 
 def encode_content_disposition_filename(filename: str) -> str:
     """
@@ -32,15 +57,69 @@ def encode_content_disposition_filename(filename: str) -> str:
     return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
 
 
+def to_naive_utc(value: datetime | None) -> datetime | None:
+    """
+    Колонки анализов — TIMESTAMP без зоны в UTC, а asyncpg не принимает для них aware datetime.
+    Время со смещением (...Z, +03:00) переводим в UTC и отбрасываем зону.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def file_stream_response(file_stream: model.AsyncWeedDownloadStream, filename: str) -> Response:
+    """
+    Build a pass-through response for a file stream opened in storage.
+    Status (200/206/416), Content-Type, Content-Length and range validators
+    are taken from the volume server response.
+    Files from the local disk cache are served with FileResponse,
+    which handles Range itself and uses sendfile where the server supports it.
+    """
+    if file_stream.path:
+        # Валидаторы storage заменяют ETag и Last-Modified, которые FileResponse вывел бы из stat файла
+        cached_headers = {"Content-Disposition": encode_content_disposition_filename(filename)}
+        if file_stream.etag:
+            cached_headers["ETag"] = file_stream.etag
+        if file_stream.last_modified:
+            cached_headers["Last-Modified"] = file_stream.last_modified
+        return FileResponse(file_stream.path, media_type=file_stream.content_type, headers=cached_headers)
+
+    headers = {"Accept-Ranges": "bytes"}
+    if file_stream.content_range:
+        headers["Content-Range"] = file_stream.content_range
+    if file_stream.etag:
+        headers["ETag"] = file_stream.etag
+    if file_stream.last_modified:
+        headers["Last-Modified"] = file_stream.last_modified
+
+    if file_stream.status_code == 416:
+        return Response(status_code=416, headers=headers)
+
+    headers["Content-Disposition"] = encode_content_disposition_filename(filename)
+    if file_stream.content_length is not None:
+        headers["Content-Length"] = str(file_stream.content_length)
+
+    return StreamingResponse(
+        file_stream.chunks,
+        status_code=file_stream.status_code,
+        media_type=file_stream.content_type,
+        headers=headers,
+    )
+
+
 class AnalysisController(interface.IAnalysisController):
     def __init__(
             self,
             tel: interface.ITelemetry,
             analysis_service: interface.IAnalysisService,
+            idempotency_service: interface.IIdempotencyService,
+            analysis_event_service: interface.IAnalysisEventService,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.analysis_service = analysis_service
+        self.idempotency_service = idempotency_service
+        self.analysis_event_service = analysis_event_service
 
     @auto_log()
     @traced_method()
@@ -61,14 +140,21 @@ class AnalysisController(interface.IAnalysisController):
         if account_type != "nurse":
             return JSONResponse(status_code=403, content={"error": "Only nurses can create analyses"})
 
-        analysis_id = await self.analysis_service.create_analysis(
-            nurse_id=account_id,
-            analysis_type=analysis_type,
-            study_file=study_file,
-            activity_diary_image=activity_diary_image,
-        )
+        async def create() -> tuple[int, dict]:
+            analysis_id = await self.analysis_service.create_analysis(
+                nurse_id=account_id,
+                analysis_type=analysis_type,
+                study_file=study_file,
+                activity_diary_image=activity_diary_image,
+            )
+            return 201, {"analysis_id": analysis_id}
 
-        return JSONResponse(status_code=201, content={"analysis_id": analysis_id})
+        fields = {
+            "analysis_type": analysis_type,
+            "study_file": study_file,
+            "activity_diary_image": activity_diary_image,
+        }
+        return await self._idempotent_response(request, account_id, "analysis.create", fields, create)
 
     @auto_log()
     @traced_method()
@@ -90,6 +176,28 @@ class AnalysisController(interface.IAnalysisController):
 
         return JSONResponse(status_code=200, content=analysis.to_dict())
 
+    @auto_log()
+    @traced_method()
+    async def claim_next_analysis(self, request: Request, body: ClaimNextAnalysisBody | None = None):
+        authorization_data = request.state.authorization_data
+        account_id = authorization_data.account_id
+        account_type = authorization_data.account_type
+
+        if account_id == 0:
+            return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+        if account_type != "doctor":
+            return JSONResponse(status_code=403, content={"error": "Only doctors can take analyses"})
+
+        analysis = await self.analysis_service.claim_next_analysis(
+            doctor_id=account_id,
+            analysis_type=body.analysis_type if body else None,
+        )
+        if analysis is None:
+            return Response(status_code=204)
+
+        return JSONResponse(status_code=200, content=analysis.to_dict())
+
     @auto_log()
     @traced_method()
     async def reject_analysis(self, request: Request, body: RejectAnalysisBody) -> JSONResponse:
@@ -128,16 +236,33 @@ class AnalysisController(interface.IAnalysisController):
         if account_type != "doctor":
             return JSONResponse(status_code=403, content={"error": "Only doctors can complete analyses"})
 
-        await self.analysis_service.complete_analysis(
-            analysis_id=analysis_id,
-            conclusion_file=conclusion_file,
-        )
+        async def complete() -> tuple[int, dict]:
+            await self.analysis_service.complete_analysis(
+                analysis_id=analysis_id,
+                conclusion_file=conclusion_file,
+            )
+            return 200, {"message": "Analysis completed successfully"}
 
-        return JSONResponse(status_code=200, content={"message": "Analysis completed successfully"})
+        # Ключ действует в пределах одного анализа: тот же ключ для другого анализа — другая операция
+        fields = {"analysis_id": analysis_id, "conclusion_file": conclusion_file}
+        return await self._idempotent_response(
+            request, account_id, f"analysis.complete:{analysis_id}", fields, complete
+        )
 
     @auto_log()
     @traced_method()
-    async def get_all_analyses(self, request: Request) -> JSONResponse:
+    async def get_all_analyses(
+            self,
+            request: Request,
+            limit: int = Query(100, ge=1, le=500),
+            cursor: str | None = Query(None),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            nurse_id: int | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ) -> JSONResponse:
         authorization_data = request.state.authorization_data
         account_id = authorization_data.account_id
         account_type = authorization_data.account_type
@@ -148,14 +273,40 @@ class AnalysisController(interface.IAnalysisController):
         if account_type != "doctor":
             return JSONResponse(status_code=403, content={"error": "Only doctors can complete analyses"})
 
-        analyses = await self.analysis_service.get_all_analyses()
-        analyses_dict = [analysis.to_dict() for analysis in analyses]
+        analysis_filter = model.AnalysisFilter(
+            status=status,
+            analysis_type=analysis_type,
+            nurse_id=nurse_id,
+            doctor_id=doctor_id,
+            created_from=to_naive_utc(created_from),
+            created_to=to_naive_utc(created_to),
+        )
 
-        return JSONResponse(status_code=200, content={"analyses": analyses_dict})
+        try:
+            page = await self.analysis_service.get_all_analyses(
+                analysis_filter,
+                limit,
+                cursor,
+                request.headers.get("If-None-Match"),
+            )
+        except common.ErrInvalidCursor as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        return self._analyses_page_response(page)
 
     @auto_log()
     @traced_method()
-    async def get_analyses_by_nurse(self, request: Request) -> JSONResponse:
+    async def get_analyses_by_nurse(
+            self,
+            request: Request,
+            limit: int = Query(100, ge=1, le=500),
+            cursor: str | None = Query(None),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ) -> JSONResponse:
         authorization_data = request.state.authorization_data
         account_id = authorization_data.account_id
         account_type = authorization_data.account_type
@@ -166,10 +317,133 @@ class AnalysisController(interface.IAnalysisController):
         if account_type != "nurse":
             return JSONResponse(status_code=403, content={"error": "Only nurses can view their analyses"})
 
-        analyses = await self.analysis_service.get_analyses_by_nurse(nurse_id=account_id)
-        analyses_dict = [analysis.to_dict() for analysis in analyses]
+        analysis_filter = model.AnalysisFilter(
+            status=status,
+            analysis_type=analysis_type,
+            nurse_id=account_id,
+            doctor_id=doctor_id,
+            created_from=to_naive_utc(created_from),
+            created_to=to_naive_utc(created_to),
+        )
+
+        try:
+            page = await self.analysis_service.get_analyses_by_nurse(
+                account_id,
+                analysis_filter,
+                limit,
+                cursor,
+                request.headers.get("If-None-Match"),
+            )
+        except common.ErrInvalidCursor as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        return self._analyses_page_response(page)
+
+    @auto_log()
+    @traced_method()
+    async def export_analyses(
+            self,
+            request: Request,
+            export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            nurse_id: int | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ):
+        authorization_data = request.state.authorization_data
+        account_id = authorization_data.account_id
+        account_type = authorization_data.account_type
+
+        if account_id == 0:
+            return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+        if account_type != "doctor":
+            return JSONResponse(status_code=403, content={"error": "Only doctors can export analyses"})
+
+        analysis_filter = model.AnalysisFilter(
+            status=status,
+            analysis_type=analysis_type,
+            nurse_id=nurse_id,
+            doctor_id=doctor_id,
+            created_from=to_naive_utc(created_from),
+            created_to=to_naive_utc(created_to),
+        )
+
+        media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+
+        return StreamingResponse(
+            self.analysis_service.export_analyses(analysis_filter, export_format),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename=\"analyses.{export_format}\""},
+        )
+
+    @auto_log()
+    @traced_method()
+    async def get_analysis_changes(
+            self,
+            request: Request,
+            since: str | None = Query(None),
+            limit: int = Query(500, ge=1, le=1000),
+    ) -> JSONResponse:
+        authorization_data = request.state.authorization_data
+        account_id = authorization_data.account_id
+        account_type = authorization_data.account_type
+
+        if account_id == 0:
+            return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+        if account_type not in ("doctor", "nurse"):
+            return JSONResponse(status_code=403, content={"error": "Only doctors and nurses can sync analyses"})
+
+        # Врач синхронизирует все анализы, медсестра — только свои
+        nurse_id = account_id if account_type == "nurse" else None
+
+        try:
+            analyses, watermark, has_more = await self.analysis_service.get_analysis_changes(nurse_id, since, limit)
+        except common.ErrInvalidCursor as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                "analyses": [analysis.to_dict() for analysis in analyses],
+                "watermark": watermark,
+                "has_more": has_more,
+            },
+        )
 
-        return JSONResponse(status_code=200, content={"analyses": analyses_dict})
+    @auto_log()
+    @traced_method()
+    async def analysis_events(self, request: Request):
+        authorization_data = request.state.authorization_data
+        account_id = authorization_data.account_id
+        account_type = authorization_data.account_type
+
+        if account_id == 0:
+            return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+        if account_type not in ("doctor", "nurse"):
+            return JSONResponse(status_code=403, content={"error": "Only doctors and nurses can subscribe to analyses"})
+
+        events = self.analysis_event_service.events(account_id, account_type, SSE_KEEPALIVE_INTERVAL)
+
+        async def event_stream() -> AsyncIterator[bytes]:
+            try:
+                async for event in events:
+                    if event is None:
+                        yield b": keepalive\n\n"
+                    else:
+                        yield b"event: " + event.kind.encode() + b"\ndata: " + json.dumps(event.to_dict()).encode() + b"\n\n"
+            finally:
+                await events.aclose()
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     @auto_log()
     @traced_method()
@@ -185,15 +459,14 @@ class AnalysisController(interface.IAnalysisController):
             return JSONResponse(status_code=403, content={"error": "Only doctors can download study files"})
 
         try:
-            file_obj, content_type, filename = await self.analysis_service.get_analysis_file(aid, "study")
-
-            return StreamingResponse(
-                file_obj,
-                media_type=content_type,
-                headers={
-                    "Content-Disposition": encode_content_disposition_filename(filename)
-                }
+            file_stream, filename = await self.analysis_service.get_analysis_file(
+                aid,
+                "study",
+                range_header=request.headers.get("Range"),
+                if_range=request.headers.get("If-Range"),
             )
+
+            return file_stream_response(file_stream, filename)
         except Exception as e:
             return JSONResponse(status_code=404, content={"error": str(e)})
 
@@ -211,15 +484,14 @@ class AnalysisController(interface.IAnalysisController):
             return JSONResponse(status_code=403, content={"error": "Only doctors can download activity diary files"})
 
         try:
-            file_obj, content_type, filename = await self.analysis_service.get_analysis_file(aid, "activity_diary")
-
-            return StreamingResponse(
-                file_obj,
-                media_type=content_type,
-                headers={
-                    "Content-Disposition": encode_content_disposition_filename(filename)
-                }
+            file_stream, filename = await self.analysis_service.get_analysis_file(
+                aid,
+                "activity_diary",
+                range_header=request.headers.get("Range"),
+                if_range=request.headers.get("If-Range"),
             )
+
+            return file_stream_response(file_stream, filename)
         except Exception as e:
             return JSONResponse(status_code=404, content={"error": str(e)})
 
@@ -237,14 +509,60 @@ class AnalysisController(interface.IAnalysisController):
             return JSONResponse(status_code=403, content={"error": "Only nurses can download conclusion files"})
 
         try:
-            file_obj, content_type, filename = await self.analysis_service.get_analysis_file(aid, "conclusion")
-
-            return StreamingResponse(
-                file_obj,
-                media_type=content_type,
-                headers={
-                    "Content-Disposition": encode_content_disposition_filename(filename)
-                }
+            file_stream, filename = await self.analysis_service.get_analysis_file(
+                aid,
+                "conclusion",
+                range_header=request.headers.get("Range"),
+                if_range=request.headers.get("If-Range"),
             )
+
+            return file_stream_response(file_stream, filename)
         except Exception as e:
             return JSONResponse(status_code=404, content={"error": str(e)})
+
+    @staticmethod
+    def _analyses_page_response(page: model.AnalysesPage) -> Response:
+        headers = {"Cache-Control": LIST_CACHE_CONTROL}
+        if page.etag:
+            headers["ETag"] = page.etag
+        if page.not_modified:
+            return Response(status_code=304, headers=headers)
+
+        analyses_dict = [analysis.to_dict() for analysis in page.analyses]
+        return JSONResponse(
+            status_code=200,
+            content={"analyses": analyses_dict, "next_cursor": page.next_cursor},
+            headers=headers,
+        )
+
+    async def _idempotent_response(
+            self,
+            request: Request,
+            account_id: int,
+            operation: str,
+            fields: dict,
+            handler: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> JSONResponse:
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if not idempotency_key:
+            status_code, content = await handler()
+            return JSONResponse(status_code=status_code, content=content)
+
+        if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return JSONResponse(status_code=400, content={"error": "Idempotency-Key is too long"})
+
+        try:
+            response = await self.idempotency_service.execute(
+                account_id,
+                operation,
+                idempotency_key,
+                request_fingerprint(request, fields),
+                handler,
+            )
+        except common.ErrIdempotencyKeyInFlight as e:
+            return JSONResponse(status_code=409, content={"error": str(e)})
+        except common.ErrIdempotencyKeyReused as e:
+            return JSONResponse(status_code=422, content={"error": str(e)})
+
+        headers = {"Idempotent-Replayed": "true"} if response.replayed else None
+        return JSONResponse(status_code=response.status_code, content=response.content, headers=headers)
@@ -5,6 +5,10 @@ class TakeAnalysisBody(BaseModel):
     analysis_id: int
 
 
+class ClaimNextAnalysisBody(BaseModel):
+    analysis_type: str | None = None
+
+
 class RejectAnalysisBody(BaseModel):
     analysis_id: int
     rejection_comment: str
\ No newline at end of file
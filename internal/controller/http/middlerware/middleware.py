@@ -1,6 +1,7 @@
 from collections.abc import Callable
 from contextvars import ContextVar
 
+import jwt
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from opentelemetry import propagate
@@ -15,15 +16,19 @@ class HttpMiddleware(interface.IHttpMiddleware):
         self,
         tel: interface.ITelemetry,
         emu_authorization_client: interface.IEmuAuthorizationClient,
+        authorization_service: interface.IAuthorizationService,
         prefix: str,
         log_context: ContextVar[dict],
+        auth_verify_mode: str = "local",
     ):
         self.tracer = tel.tracer()
         self.meter = tel.meter()
         self.logger = tel.logger()
         self.prefix = prefix
         self.emu_authorization_client = emu_authorization_client
+        self.authorization_service = authorization_service
         self.log_context = log_context
+        self.auth_verify_mode = auth_verify_mode
 
     def trace_middleware01(self, app: FastAPI):
         @app.middleware("http")
@@ -117,7 +122,7 @@ class HttpMiddleware(interface.IHttpMiddleware):
                             account_id=0, account_type="guest", message="guest", status_code=200
                         )
                     else:
-                        authorization_data = await self.emu_authorization_client.check_authorization(access_token)
+                        authorization_data = await self._check_authorization(access_token)
 
                     request.state.authorization_data = authorization_data
 
@@ -134,3 +139,26 @@ class HttpMiddleware(interface.IHttpMiddleware):
                     raise e
 
         return _authorization_middleware03
+
+    async def _check_authorization(self, access_token: str) -> model.AuthorizationData:
+        if self.auth_verify_mode == "remote":
+            return await self.emu_authorization_client.check_authorization(access_token)
+
+        # Подпись HS256 проверяется в процессе тем же ключом, что и в /check-authorization
+        try:
+            token_payload = await self.authorization_service.check_token(access_token)
+        except jwt.ExpiredSignatureError:
+            return model.AuthorizationData(account_id=-1, account_type="", message="token expired", status_code=403)
+        except jwt.InvalidSignatureError:
+            # Ключ мог смениться раньше, чем у этого инстанса — решение за сервисом авторизации
+            self.logger.info("Подпись токена не сошлась локально, проверка через сервис авторизации")
+            return await self.emu_authorization_client.check_authorization(access_token)
+        except jwt.InvalidTokenError:
+            return model.AuthorizationData(account_id=-1, account_type="", message="token invalid", status_code=403)
+
+        return model.AuthorizationData(
+            account_id=token_payload.account_id,
+            account_type=token_payload.account_type,
+            message="Access-Token verified",
+            status_code=200,
+        )
@@ -1,5 +1,8 @@
 from internal.interface.account import *
 from internal.interface.authorization import *
 from internal.interface.analysis import *
+from internal.interface.analysis_event import *
+from internal.interface.file_blob import *
+from internal.interface.idempotency import *
 from internal.interface.client.emu_authorization import *
 from internal.interface.general import *
@@ -1,5 +1,6 @@
 import io
 from abc import abstractmethod
+from collections.abc import AsyncIterable, Iterable
 from typing import Protocol
 
 from fastapi import Request
@@ -50,6 +51,10 @@ class IAccountRepo(Protocol):
     async def create_account(self, login: str, password: str, account_type: str) -> int:
         pass
 
+    @abstractmethod
+    async def import_accounts(self, records: Iterable[tuple] | AsyncIterable[tuple]) -> int:
+        pass
+
     @abstractmethod
     async def account_by_id(self, account_id: int) -> list[model.Account]:
         pass
@@ -1,12 +1,15 @@
 from abc import abstractmethod
-from typing import Protocol
-import io
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime
+from typing import Literal, Protocol
 
-from fastapi import UploadFile, Form, Request
+from fastapi import UploadFile, Form, Query, Request
 from fastapi.responses import JSONResponse
 
 from internal import model
 from internal.controller.http.handler.analysis.model import (
+    ClaimNextAnalysisBody,
     RejectAnalysisBody,
     TakeAnalysisBody,
 )
@@ -27,6 +30,10 @@ class IAnalysisController(Protocol):
     async def take_analysis(self, request: Request, body: TakeAnalysisBody) -> JSONResponse:
         pass
 
+    @abstractmethod
+    async def claim_next_analysis(self, request: Request, body: ClaimNextAnalysisBody | None = None):
+        pass
+
     @abstractmethod
     async def reject_analysis(self, request: Request, body: RejectAnalysisBody) -> JSONResponse:
         pass
@@ -41,11 +48,59 @@ class IAnalysisController(Protocol):
         pass
 
     @abstractmethod
-    async def get_all_analyses(self, request: Request,) -> JSONResponse:
+    async def get_all_analyses(
+            self,
+            request: Request,
+            limit: int = Query(100, ge=1, le=500),
+            cursor: str | None = Query(None),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            nurse_id: int | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def get_analyses_by_nurse(
+            self,
+            request: Request,
+            limit: int = Query(100, ge=1, le=500),
+            cursor: str | None = Query(None),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def export_analyses(
+            self,
+            request: Request,
+            export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+            status: str | None = Query(None),
+            analysis_type: str | None = Query(None),
+            nurse_id: int | None = Query(None),
+            doctor_id: int | None = Query(None),
+            created_from: datetime | None = Query(None),
+            created_to: datetime | None = Query(None),
+    ):
+        pass
+
+    @abstractmethod
+    async def get_analysis_changes(
+            self,
+            request: Request,
+            since: str | None = Query(None),
+            limit: int = Query(500, ge=1, le=1000),
+    ) -> JSONResponse:
         pass
 
     @abstractmethod
-    async def get_analyses_by_nurse(self, request: Request,) -> JSONResponse:
+    async def analysis_events(self, request: Request):
         pass
 
     @abstractmethod
@@ -76,6 +131,10 @@ class IAnalysisService(Protocol):
     async def take_analysis(self, doctor_id: int, analysis_id: int) -> model.Analysis:
         pass
 
+    @abstractmethod
+    async def claim_next_analysis(self, doctor_id: int, analysis_type: str | None = None) -> model.Analysis | None:
+        pass
+
     @abstractmethod
     async def reject_analysis(self, analysis_id: int, rejection_comment: str) -> None:
         pass
@@ -85,15 +144,51 @@ class IAnalysisService(Protocol):
         pass
 
     @abstractmethod
-    async def get_all_analyses(self) -> list[model.Analysis]:
+    async def get_all_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            limit: int = 100,
+            cursor: str | None = None,
+            if_none_match: str | None = None,
+    ) -> model.AnalysesPage:
+        pass
+
+    @abstractmethod
+    async def get_analyses_by_nurse(
+            self,
+            nurse_id: int,
+            analysis_filter: model.AnalysisFilter,
+            limit: int = 100,
+            cursor: str | None = None,
+            if_none_match: str | None = None,
+    ) -> model.AnalysesPage:
+        pass
+
+    @abstractmethod
+    def export_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            export_format: str = "ndjson",
+    ) -> AsyncIterator[bytes]:
         pass
 
     @abstractmethod
-    async def get_analyses_by_nurse(self, nurse_id: int) -> list[model.Analysis]:
+    async def get_analysis_changes(
+            self,
+            nurse_id: int | None,
+            since: str | None = None,
+            limit: int = 500,
+    ) -> tuple[list[model.Analysis], str | None, bool]:
         pass
 
     @abstractmethod
-    async def get_analysis_file(self, analysis_id: int, file_type: str) -> tuple[io.BytesIO, str, str]:
+    async def get_analysis_file(
+            self,
+            analysis_id: int,
+            file_type: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> tuple[model.AsyncWeedDownloadStream, str]:
         pass
 
 
@@ -110,26 +205,70 @@ class IAnalysisRepo(Protocol):
     ) -> int:
         pass
 
+    @abstractmethod
+    async def import_analyses(self, records: Iterable[tuple] | AsyncIterable[tuple]) -> int:
+        pass
+
     @abstractmethod
     async def get_analysis_by_id(self, analysis_id: int) -> list[model.Analysis]:
         pass
 
     @abstractmethod
-    async def get_all_analyses(self) -> list[model.Analysis]:
+    async def get_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            limit: int,
+            cursor: model.AnalysisCursor | None = None,
+    ) -> list[model.Analysis]:
+        pass
+
+    @abstractmethod
+    def stream_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[list[model.Analysis]]:
+        pass
+
+    @abstractmethod
+    def copy_analyses_csv(self, analysis_filter: model.AnalysisFilter) -> AsyncIterator[bytes]:
         pass
 
     @abstractmethod
-    async def get_analyses_by_nurse(self, nurse_id: int) -> list[model.Analysis]:
+    def read_snapshot(self) -> AbstractAsyncContextManager[None]:
         pass
 
     @abstractmethod
-    async def set_doctor_and_start(self, analysis_id: int, doctor_id: int) -> None:
+    async def get_analyses_version(self, analysis_filter: model.AnalysisFilter) -> tuple[int, datetime | None]:
+        pass
+
+    @abstractmethod
+    async def get_analysis_changes(
+            self,
+            nurse_id: int | None,
+            watermark: model.AnalysisWatermark | None,
+            limit: int,
+            settle_seconds: float,
+    ) -> list[model.Analysis]:
         pass
 
     @abstractmethod
-    async def set_rejection(self, analysis_id: int, rejection_comment: str) -> None:
+    async def set_doctor_and_start(self, analysis_id: int, doctor_id: int) -> model.Analysis:
         pass
 
     @abstractmethod
-    async def set_conclusion(self, analysis_id: int, conclusion_file_fid: str, conclusion_file_original_name: str) -> None:
+    async def claim_next_analysis(self, doctor_id: int, analysis_type: str | None = None) -> list[model.Analysis]:
+        pass
+
+    @abstractmethod
+    async def set_rejection(self, analysis_id: int, rejection_comment: str) -> model.Analysis:
+        pass
+
+    @abstractmethod
+    async def set_conclusion(
+            self,
+            analysis_id: int,
+            conclusion_file_fid: str,
+            conclusion_file_original_name: str,
+    ) -> model.Analysis:
         pass
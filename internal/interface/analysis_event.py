@@ -0,0 +1,16 @@
+from abc import abstractmethod
+from collections.abc import AsyncIterator
+from typing import Protocol
+
+from internal import model
+
+
+class IAnalysisEventService(Protocol):
+    @abstractmethod
+    def events(
+            self,
+            account_id: int,
+            account_type: str,
+            keepalive_interval: float = 15,
+    ) -> AsyncIterator[model.AnalysisEvent | None]:
+        pass
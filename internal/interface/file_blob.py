@@ -0,0 +1,18 @@
+from abc import abstractmethod
+from typing import Protocol
+
+from internal import model
+
+
+class IFileBlobRepo(Protocol):
+    @abstractmethod
+    async def acquire_blob(self, sha256: str) -> list[model.FileBlob]:
+        pass
+
+    @abstractmethod
+    async def create_blob(self, sha256: str, fid: str, size: int) -> str:
+        pass
+
+    @abstractmethod
+    async def release_blob(self, fid: str) -> int | None:
+        pass
@@ -1,7 +1,8 @@
 import io
 from abc import abstractmethod
-from collections.abc import Sequence
-from typing import Any, Protocol
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Sequence
+from contextlib import AbstractAsyncContextManager
+from typing import Any, BinaryIO, Protocol
 
 from fastapi import FastAPI
 from opentelemetry.metrics import Meter
@@ -80,11 +81,57 @@ class IDB(Protocol):
         pass
 
     @abstractmethod
-    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+    async def select(self, query: str, query_params: dict, use_primary: bool = False) -> Sequence[Any]:
         pass
 
     @abstractmethod
-    async def multi_query(self, queries: list[str]) -> None:
+    async def execute_returning(self, query: str, query_params: dict) -> Sequence[Any]:
+        pass
+
+    @abstractmethod
+    async def multi_query(self, queries: list[str], autocommit: bool = False) -> None:
+        pass
+
+    @abstractmethod
+    def transaction(self, read_only: bool = False) -> AbstractAsyncContextManager[None]:
+        pass
+
+    @abstractmethod
+    def stream(
+            self,
+            query: str,
+            query_params: dict,
+            batch_size: int = 1000,
+            use_primary: bool = False,
+    ) -> AsyncIterator[Sequence[Any]]:
+        pass
+
+    @abstractmethod
+    async def copy_from(
+            self,
+            table: str,
+            columns: Sequence[str],
+            records: Iterable[Sequence[Any]] | AsyncIterable[Sequence[Any]],
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def listen(
+            self,
+            channel: str,
+            callback: Callable[[str], None],
+            on_reconnect: Callable[[], None] | None = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def copy_to(
+            self,
+            query: str,
+            query_params: dict | None = None,
+            copy_format: str = "csv",
+            use_primary: bool = False,
+    ) -> AsyncIterator[bytes]:
         pass
 
 class IStorage(Protocol):
@@ -94,8 +141,24 @@ class IStorage(Protocol):
     @abstractmethod
     async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]: pass
 
+    @abstractmethod
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> model.AsyncWeedDownloadStream: pass
+
     @abstractmethod
     async def upload(self, file: io.BytesIO, name: str) -> model.AsyncWeedOperationResponse: pass
 
+    @abstractmethod
+    async def upload_stream(
+            self,
+            stream: AsyncIterable[bytes] | BinaryIO,
+            name: str,
+    ) -> model.AsyncWeedOperationResponse: pass
+
     @abstractmethod
     async def update(self, file: io.BytesIO, fid: str, name: str): pass
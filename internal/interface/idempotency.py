@@ -0,0 +1,52 @@
+from abc import abstractmethod
+from collections.abc import Awaitable, Callable
+from typing import Protocol
+
+from internal import model
+
+
+class IIdempotencyService(Protocol):
+    @abstractmethod
+    async def execute(
+            self,
+            account_id: int,
+            operation: str,
+            idempotency_key: str,
+            request_fingerprint: str,
+            handler: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> model.IdempotentResponse:
+        pass
+
+
+class IIdempotencyRepo(Protocol):
+    @abstractmethod
+    async def claim_key(
+            self,
+            account_id: int,
+            operation: str,
+            idempotency_key: str,
+            request_fingerprint: str,
+            lock_ttl: int,
+            key_ttl: int,
+    ) -> int | None:
+        pass
+
+    @abstractmethod
+    async def get_key(self, account_id: int, operation: str, idempotency_key: str) -> list[model.IdempotencyKey]:
+        pass
+
+    @abstractmethod
+    async def complete_key(self, key_id: int, response_status_code: int, response_body: str) -> None:
+        pass
+
+    @abstractmethod
+    async def extend_key(self, key_id: int, lock_ttl: int) -> None:
+        pass
+
+    @abstractmethod
+    async def release_key(self, key_id: int) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_expired_keys(self) -> None:
+        pass
@@ -7,6 +7,10 @@ class MigrationInfo:
     version: str
     name: str
     depends_on: str = None
+    # False — миграция выполняется вне транзакции (например, CREATE INDEX CONCURRENTLY)
+    transactional: bool = True
+    # Индексы, которые строятся CONCURRENTLY: после сбоя из них удаляются только оставшиеся INVALID
+    concurrent_indexes: tuple[str, ...] = ()
 
 
 class Migration(ABC):
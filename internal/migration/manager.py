@@ -70,7 +70,11 @@ class MigrationManager:
     async def _get_applied_versions(self) -> set[str]:
         print("🔍 MigrationManager: Получение примененных версий...", flush=True)
         try:
-            rows = await self.db.select("SELECT version FROM migration_history ORDER BY version", {})
+            rows = await self.db.select(
+                "SELECT version FROM migration_history ORDER BY version",
+                {},
+                use_primary=True,
+            )
             applied = {row[0] for row in rows}
             print(f"📊 MigrationManager: Применённые версии: {applied if applied else 'нет'}", flush=True)
             return applied
@@ -91,6 +95,43 @@ class MigrationManager:
         await self.db.delete("DELETE FROM migration_history WHERE version = :version", {"version": version})
         print(f"✅ MigrationManager: Миграция {version} откачена", flush=True)
 
+    async def _apply(self, migration: Migration):
+        try:
+            await migration.up(self.db)
+        except Exception:
+            # Прерванный CREATE INDEX CONCURRENTLY оставляет INVALID-индекс, и IF NOT EXISTS при повторе его не пересоздаст.
+            # Достроенные и существовавшие раньше индексы не трогаем
+            if not migration.info.transactional and migration.info.concurrent_indexes:
+                print(
+                    f"🧹 MigrationManager: Очистка после неудачной нетранзакционной миграции {migration.info.version}...",
+                    flush=True,
+                )
+                try:
+                    await self._drop_invalid_indexes(migration.info.concurrent_indexes)
+                except Exception as e:
+                    print(f"❌ MigrationManager: ОШИБКА очистки миграции {migration.info.version}: {e}", flush=True)
+            raise
+
+    async def _drop_invalid_indexes(self, index_names: tuple[str, ...]):
+        rows = await self.db.select(
+            """
+            SELECT c.relname FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:index_names)
+            """,
+            {"index_names": list(index_names)},
+            use_primary=True,
+        )
+        invalid = [row[0] for row in rows]
+        if not invalid:
+            return
+
+        print(f"🗑️  MigrationManager: Удаление INVALID индексов: {invalid}", flush=True)
+        await self.db.multi_query(
+            [f'DROP INDEX CONCURRENTLY IF EXISTS "{name}";' for name in invalid],
+            autocommit=True,
+        )
+
     def _version_key(self, version: str) -> tuple:
         key = tuple(map(int, version.lstrip("v").split("_")))
         print(f"🔑 MigrationManager: Ключ версии для {version}: {key}", flush=True)
@@ -146,7 +187,7 @@ class MigrationManager:
                     )
                     continue
 
-                await migration.up(self.db)
+                await self._apply(migration)
                 await self._mark_applied(migration)
                 applied.add(version)
                 count += 1
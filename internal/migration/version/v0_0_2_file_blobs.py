@@ -0,0 +1,40 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class FileBlobsMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_2",
+            name="file_blobs",
+            depends_on="v0_0_1",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [create_file_blobs_table]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [drop_file_blobs_table]
+
+        await db.multi_query(queries)
+
+
+create_file_blobs_table = """
+CREATE TABLE IF NOT EXISTS file_blobs (
+    id SERIAL PRIMARY KEY,
+
+    sha256 TEXT NOT NULL UNIQUE,
+    fid TEXT NOT NULL UNIQUE,
+    size BIGINT NOT NULL DEFAULT 0,
+    ref_count INTEGER NOT NULL DEFAULT 1,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+drop_file_blobs_table = """
+DROP TABLE IF EXISTS file_blobs CASCADE;
+"""
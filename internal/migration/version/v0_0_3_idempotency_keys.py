@@ -0,0 +1,46 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class IdempotencyKeysMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_3",
+            name="idempotency_keys",
+            depends_on="v0_0_2",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [create_idempotency_keys_table]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [drop_idempotency_keys_table]
+
+        await db.multi_query(queries)
+
+
+create_idempotency_keys_table = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id SERIAL PRIMARY KEY,
+
+    account_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'in_flight',
+    response_status_code INTEGER,
+    response_body TEXT,
+
+    locked_until TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE (account_id, operation, idempotency_key)
+);
+"""
+
+drop_idempotency_keys_table = """
+DROP TABLE IF EXISTS idempotency_keys CASCADE;
+"""
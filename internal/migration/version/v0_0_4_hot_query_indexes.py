@@ -0,0 +1,117 @@
+from internal import common, interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class HotQueryIndexesMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_4",
+            name="hot_query_indexes",
+            depends_on="v0_0_3",
+            transactional=False,
+            concurrent_indexes=(
+                "idx_analyses_nurse_id_created_at",
+                "idx_analyses_created_at",
+                "idx_analyses_status_created_at",
+                "idx_analyses_pending",
+                "idx_accounts_login",
+                "idx_accounts_refresh_token",
+            ),
+        )
+
+    async def up(self, db: interface.IDB):
+        # Уникальный индекс не построится на дубликатах — проверяем заранее, до построения остальных
+        rows = await db.select(get_duplicate_account_logins, {}, use_primary=True)
+        if rows:
+            raise common.ErrDuplicateAccountLogins([row[0] for row in rows])
+
+        queries = [
+            create_analyses_nurse_created_index,
+            create_analyses_created_index,
+            create_analyses_status_created_index,
+            create_analyses_pending_index,
+            create_accounts_login_index,
+            create_accounts_refresh_token_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_analyses_nurse_created_index,
+            drop_analyses_created_index,
+            drop_analyses_status_created_index,
+            drop_analyses_pending_index,
+            drop_accounts_login_index,
+            drop_accounts_refresh_token_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+
+get_duplicate_account_logins = """
+SELECT login FROM accounts
+GROUP BY login
+HAVING count(*) > 1
+ORDER BY login
+LIMIT 20;
+"""
+
+# Списки анализов: keyset-пагинация по (created_at, id) с фильтром и без
+create_analyses_nurse_created_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_nurse_id_created_at
+ON analyses (nurse_id, created_at DESC, id DESC);
+"""
+
+create_analyses_created_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_created_at
+ON analyses (created_at DESC, id DESC);
+"""
+
+create_analyses_status_created_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_status_created_at
+ON analyses (status, created_at DESC, id DESC);
+"""
+
+# Очередь врачей: самые старые pending
+create_analyses_pending_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_pending
+ON analyses (created_at, id)
+WHERE status = 'pending';
+"""
+
+# Логин и проверка дубликата при создании аккаунта
+create_accounts_login_index = """
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_accounts_login
+ON accounts (login);
+"""
+
+# Обновление токена ищет только по равенству
+create_accounts_refresh_token_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_accounts_refresh_token
+ON accounts USING hash (refresh_token);
+"""
+
+drop_analyses_nurse_created_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_nurse_id_created_at;
+"""
+
+drop_analyses_created_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_created_at;
+"""
+
+drop_analyses_status_created_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_status_created_at;
+"""
+
+drop_analyses_pending_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_pending;
+"""
+
+drop_accounts_login_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_accounts_login;
+"""
+
+drop_accounts_refresh_token_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_accounts_refresh_token;
+"""
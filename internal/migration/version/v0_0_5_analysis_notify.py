@@ -0,0 +1,60 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AnalysisNotifyMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_5",
+            name="analysis_notify",
+            depends_on="v0_0_4",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_notify_analysis_change_function,
+            drop_analyses_notify_trigger,
+            create_analyses_notify_trigger,
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_analyses_notify_trigger,
+            drop_notify_analysis_change_function,
+        ]
+
+        await db.multi_query(queries)
+
+
+# Уведомление уходит слушателям при коммите транзакции, изменившей анализ
+create_notify_analysis_change_function = """
+CREATE OR REPLACE FUNCTION notify_analysis_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('analysis_events', json_build_object(
+        'id', NEW.id,
+        'nurse_id', NEW.nurse_id,
+        'doctor_id', NEW.doctor_id,
+        'analysis_type', NEW.analysis_type,
+        'status', NEW.status,
+        'updated_at', NEW.updated_at
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+create_analyses_notify_trigger = """
+CREATE TRIGGER analyses_notify_change
+AFTER INSERT OR UPDATE OF status ON analyses
+FOR EACH ROW EXECUTE FUNCTION notify_analysis_change();
+"""
+
+drop_analyses_notify_trigger = """
+DROP TRIGGER IF EXISTS analyses_notify_change ON analyses;
+"""
+
+drop_notify_analysis_change_function = """
+DROP FUNCTION IF EXISTS notify_analysis_change();
+"""
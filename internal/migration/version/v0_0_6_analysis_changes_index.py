@@ -0,0 +1,52 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AnalysisChangesIndexMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_6",
+            name="analysis_changes_index",
+            depends_on="v0_0_5",
+            transactional=False,
+            concurrent_indexes=(
+                "idx_analyses_updated_at",
+                "idx_analyses_nurse_id_updated_at",
+            ),
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_analyses_updated_index,
+            create_analyses_nurse_updated_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_analyses_updated_index,
+            drop_analyses_nurse_updated_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+
+# Дельта-синхронизация: изменения после водяного знака (updated_at, id), для врачей и медсестёр
+create_analyses_updated_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_updated_at
+ON analyses (updated_at, id);
+"""
+
+create_analyses_nurse_updated_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_nurse_id_updated_at
+ON analyses (nurse_id, updated_at, id);
+"""
+
+drop_analyses_updated_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_updated_at;
+"""
+
+drop_analyses_nurse_updated_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_nurse_id_updated_at;
+"""
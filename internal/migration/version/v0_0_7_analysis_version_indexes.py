@@ -0,0 +1,65 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AnalysisVersionIndexesMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_7",
+            name="analysis_version_indexes",
+            depends_on="v0_0_6",
+            transactional=False,
+            concurrent_indexes=(
+                "idx_analyses_status_updated_at",
+                "idx_analyses_analysis_type_updated_at",
+                "idx_analyses_doctor_id_updated_at",
+            ),
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_analyses_status_updated_index,
+            create_analyses_analysis_type_updated_index,
+            create_analyses_doctor_updated_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_analyses_status_updated_index,
+            drop_analyses_analysis_type_updated_index,
+            drop_analyses_doctor_updated_index,
+        ]
+
+        await db.multi_query(queries, autocommit=True)
+
+
+# Версия списка для ETag (count + max(updated_at)) по фильтрам списка анализов.
+# Без фильтра и по nurse_id её покрывают индексы v0_0_6
+create_analyses_status_updated_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_status_updated_at
+ON analyses (status, updated_at);
+"""
+
+create_analyses_analysis_type_updated_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_analysis_type_updated_at
+ON analyses (analysis_type, updated_at);
+"""
+
+create_analyses_doctor_updated_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_doctor_id_updated_at
+ON analyses (doctor_id, updated_at);
+"""
+
+drop_analyses_status_updated_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_status_updated_at;
+"""
+
+drop_analyses_analysis_type_updated_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_analysis_type_updated_at;
+"""
+
+drop_analyses_doctor_updated_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_doctor_id_updated_at;
+"""
@@ -0,0 +1,33 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class IdempotencyFingerprintMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_8",
+            name="idempotency_fingerprint",
+            depends_on="v0_0_7",
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [add_idempotency_request_fingerprint]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [drop_idempotency_request_fingerprint]
+
+        await db.multi_query(queries)
+
+
+# Отпечаток запроса, с которым захвачен ключ; у ключей до миграции он пустой и не сверяется
+add_idempotency_request_fingerprint = """
+ALTER TABLE idempotency_keys
+ADD COLUMN IF NOT EXISTS request_fingerprint TEXT NOT NULL DEFAULT '';
+"""
+
+drop_idempotency_request_fingerprint = """
+ALTER TABLE idempotency_keys
+DROP COLUMN IF EXISTS request_fingerprint;
+"""
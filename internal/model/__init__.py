@@ -1,6 +1,9 @@
 from internal.model.account import *
 from internal.model.authorization import *
 from internal.model.analysis import *
+from internal.model.analysis_event import *
+from internal.model.file_blob import *
+from internal.model.idempotency import *
 from internal.model.general import *
 from internal.model.client.emu_authorization import *
 from internal.model.sql_model import *
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class Account:
     id: int
 
@@ -16,17 +16,8 @@ class Account:
 
     @classmethod
     def serialize(cls, rows) -> list["Account"]:
-        return [
-            cls(
-                id=row.id,
-                login=row.login,
-                password=row.password,
-                refresh_token=row.refresh_token,
-                account_type=row.account_type,
-                created_at=row.created_at,
-            )
-            for row in rows
-        ]
+        # Строки приходят с колонками в порядке полей (account_columns в repo)
+        return [cls(*row) for row in rows]
 
     def to_dict(self) -> dict:
         return {
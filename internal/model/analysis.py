@@ -1,8 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class Analysis:
     id: int
 
@@ -26,27 +26,8 @@ class Analysis:
 
     @classmethod
     def serialize(cls, rows) -> list["Analysis"]:
-        return [
-            cls(
-                id=row.id,
-                nurse_id=row.nurse_id,
-                doctor_id=row.doctor_id,
-                analysis_type=row.analysis_type,
-                study_file_fid=row.study_file_fid,
-                study_file_original_name=row.study_file_original_name,
-                activity_diary_image_fid=row.activity_diary_image_fid,
-                activity_diary_original_name=row.activity_diary_original_name,
-                status=row.status,
-                conclusion_file_fid=row.conclusion_file_fid,
-                conclusion_file_original_name=row.conclusion_file_original_name,
-                rejection_comment=row.rejection_comment,
-                started_at=row.started_at,
-                finished_at=row.finished_at,
-                created_at=row.created_at,
-                updated_at=row.updated_at,
-            )
-            for row in rows
-        ]
+        # Строки приходят с колонками в порядке полей (analysis_columns в repo)
+        return [cls(*row) for row in rows]
 
     def to_dict(self) -> dict:
         return {
@@ -68,3 +49,37 @@ class Analysis:
             "updated_at": self.updated_at.isoformat(),
         }
 
+
+ANALYSIS_FIELDS = tuple(field.name for field in fields(Analysis))
+
+
+@dataclass
+class AnalysisFilter:
+    status: str | None = None
+    analysis_type: str | None = None
+    nurse_id: int | None = None
+    doctor_id: int | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+
+
+@dataclass
+class AnalysisCursor:
+    created_at: datetime
+    id: int
+
+
+@dataclass
+class AnalysesPage:
+    analyses: list[Analysis]
+    next_cursor: str | None
+    # Только у первой страницы: страницы по курсору не версионируются
+    etag: str | None
+    # If-None-Match совпал: строки не выбирались
+    not_modified: bool = False
+
+
+@dataclass
+class AnalysisWatermark:
+    updated_at: datetime
+    id: int
@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class AnalysisEvent:
+    # analysis — изменился анализ; resync — события могли потеряться, клиенту нужно перечитать список
+    kind: str
+
+    id: Optional[int] = None
+    nurse_id: Optional[int] = None
+    doctor_id: Optional[int] = None
+    analysis_type: Optional[str] = None
+    status: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    @classmethod
+    def from_notify(cls, payload: dict) -> "AnalysisEvent":
+        return cls(
+            kind="analysis",
+            id=payload.get("id"),
+            nurse_id=payload.get("nurse_id"),
+            doctor_id=payload.get("doctor_id"),
+            analysis_type=payload.get("analysis_type"),
+            status=payload.get("status"),
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_dict(self) -> dict:
+        if self.kind != "analysis":
+            return {}
+
+        return {
+            "id": self.id,
+            "nurse_id": self.nurse_id,
+            "doctor_id": self.doctor_id,
+            "analysis_type": self.analysis_type,
+            "status": self.status,
+            "updated_at": self.updated_at,
+        }
@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class FileBlob:
+    id: int
+
+    sha256: str
+    fid: str
+    size: int
+    ref_count: int
+
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list["FileBlob"]:
+        return [
+            cls(
+                id=row.id,
+                sha256=row.sha256,
+                fid=row.fid,
+                size=row.size,
+                ref_count=row.ref_count,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ]
@@ -1,3 +1,4 @@
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from typing import Optional
 
@@ -10,4 +11,18 @@ class AsyncWeedOperationResponse:
     headers: dict
     fid: Optional[str] = None
     url: Optional[str] = None
-    size: Optional[int] = None
\ No newline at end of file
+    size: Optional[int] = None
+
+
+@dataclass
+class AsyncWeedDownloadStream:
+    status_code: int
+    content_type: str
+    content_length: Optional[int]
+    headers: dict
+    chunks: AsyncIterator[bytes]
+    content_range: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Путь к локальной копии файла: такой ответ отдаётся через FileResponse
+    path: Optional[str] = None
@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class IdempotencyKey:
+    id: int
+
+    account_id: int
+    operation: str
+    idempotency_key: str
+    request_fingerprint: str
+    status: str
+    response_status_code: Optional[int]
+    response_body: Optional[str]
+
+    locked_until: datetime
+    expires_at: datetime
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list["IdempotencyKey"]:
+        return [
+            cls(
+                id=row.id,
+                account_id=row.account_id,
+                operation=row.operation,
+                idempotency_key=row.idempotency_key,
+                request_fingerprint=row.request_fingerprint,
+                status=row.status,
+                response_status_code=row.response_status_code,
+                response_body=row.response_body,
+                locked_until=row.locked_until,
+                expires_at=row.expires_at,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ]
+
+
+@dataclass
+class IdempotentResponse:
+    status_code: int
+    content: dict
+    replayed: bool = False
@@ -45,12 +45,124 @@ DROP TABLE IF EXISTS analyses CASCADE;
 """
 
 
+create_file_blobs_table = """
+CREATE TABLE IF NOT EXISTS file_blobs (
+    id SERIAL PRIMARY KEY,
+
+    sha256 TEXT NOT NULL UNIQUE,
+    fid TEXT NOT NULL UNIQUE,
+    size BIGINT NOT NULL DEFAULT 0,
+    ref_count INTEGER NOT NULL DEFAULT 1,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+drop_file_blobs_table = """
+DROP TABLE IF EXISTS file_blobs CASCADE;
+"""
+
+
+create_idempotency_keys_table = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id SERIAL PRIMARY KEY,
+
+    account_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    request_fingerprint TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'in_flight',
+    response_status_code INTEGER,
+    response_body TEXT,
+
+    locked_until TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE (account_id, operation, idempotency_key)
+);
+"""
+
+drop_idempotency_keys_table = """
+DROP TABLE IF EXISTS idempotency_keys CASCADE;
+"""
+
+
+# Индексы горячих запросов; в проде создаются миграцией v0_0_4 через CONCURRENTLY
+create_hot_query_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_analyses_nurse_id_created_at ON analyses (nurse_id, created_at DESC, id DESC);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at DESC, id DESC);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_status_created_at ON analyses (status, created_at DESC, id DESC);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_pending ON analyses (created_at, id) WHERE status = 'pending';",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_login ON accounts (login);",
+    "CREATE INDEX IF NOT EXISTS idx_accounts_refresh_token ON accounts USING hash (refresh_token);",
+]
+
+# Индексы дельта-синхронизации; в проде создаются миграцией v0_0_6
+create_analysis_changes_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_analyses_updated_at ON analyses (updated_at, id);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_nurse_id_updated_at ON analyses (nurse_id, updated_at, id);",
+]
+
+# Версия списка анализов для ETag по фильтрам; в проде создаются миграцией v0_0_7
+create_analysis_version_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_analyses_status_updated_at ON analyses (status, updated_at);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_analysis_type_updated_at ON analyses (analysis_type, updated_at);",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_doctor_id_updated_at ON analyses (doctor_id, updated_at);",
+]
+
+
+# Уведомления об изменении анализов для live-обновлений (LISTEN analysis_events)
+create_notify_analysis_change_function = """
+CREATE OR REPLACE FUNCTION notify_analysis_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('analysis_events', json_build_object(
+        'id', NEW.id,
+        'nurse_id', NEW.nurse_id,
+        'doctor_id', NEW.doctor_id,
+        'analysis_type', NEW.analysis_type,
+        'status', NEW.status,
+        'updated_at', NEW.updated_at
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+drop_analyses_notify_trigger = """
+DROP TRIGGER IF EXISTS analyses_notify_change ON analyses;
+"""
+
+create_analyses_notify_trigger = """
+CREATE TRIGGER analyses_notify_change
+AFTER INSERT OR UPDATE OF status ON analyses
+FOR EACH ROW EXECUTE FUNCTION notify_analysis_change();
+"""
+
+drop_notify_analysis_change_function = """
+DROP FUNCTION IF EXISTS notify_analysis_change() CASCADE;
+"""
+
+
 create_tables_queries = [
     create_account_table,
     create_analyses_table,
+    create_file_blobs_table,
+    create_idempotency_keys_table,
+    *create_hot_query_indexes,
+    *create_analysis_changes_indexes,
+    *create_analysis_version_indexes,
+    create_notify_analysis_change_function,
+    drop_analyses_notify_trigger,
+    create_analyses_notify_trigger,
 ]
 
 drop_queries = [
     drop_account_table,
     drop_analyses_table,
+    drop_file_blobs_table,
+    drop_idempotency_keys_table,
+    drop_notify_analysis_change_function,
 ]
@@ -1,3 +1,5 @@
+from collections.abc import AsyncIterable, Iterable
+
 from internal import common, interface, model
 from pkg.trace_wrapper import traced_method
 
@@ -15,24 +17,29 @@ class AccountRepo(interface.IAccountRepo):
 
     @traced_method()
     async def create_account(self, login: str, password: str, account_type: str) -> int:
-        existing_accounts = await self.account_by_login(login)
-        if existing_accounts:
-            raise common.ErrAccountCreate()
-
         args = {
             "login": login,
             "password": password,
             "account_type": account_type,
         }
 
-        account_id = await self.db.insert(create_account, args)
+        # Дубликат логина отсекает уникальный индекс: параллельные регистрации не проскочат проверку
+        rows = await self.db.execute_returning(create_account, args)
+        if not rows:
+            raise common.ErrAccountCreate()
+
+        return rows[0][0]
 
-        return account_id
+    @traced_method()
+    async def import_accounts(self, records: Iterable[tuple] | AsyncIterable[tuple]) -> int:
+        # Кортежи в порядке account_import_columns; пароли уже должны быть захэшированы
+        return await self.db.copy_from("accounts", account_import_columns, records)
 
     @traced_method()
     async def account_by_id(self, account_id: int) -> list[model.Account]:
         args = {"account_id": account_id}
-        rows = await self.db.select(get_account_by_id, args)
+        # Проверка старого пароля перед сменой — по актуальному хэшу с primary
+        rows = await self.db.select(get_account_by_id, args, use_primary=True)
         accounts = model.Account.serialize(rows) if rows else []
 
         return accounts
@@ -40,7 +47,8 @@ class AccountRepo(interface.IAccountRepo):
     @traced_method()
     async def account_by_login(self, login: str) -> list[model.Account]:
         args = {"login": login}
-        rows = await self.db.select(get_account_by_login, args)
+        # Вход сразу после регистрации или смены пароля не должен упираться в лаг реплики
+        rows = await self.db.select(get_account_by_login, args, use_primary=True)
         accounts = model.Account.serialize(rows) if rows else []
         return accounts
 
@@ -1,3 +1,22 @@
+# Колонки в порядке полей model.Account: модель собирается из строки позиционно
+account_columns = """
+    id,
+    login,
+    password,
+    refresh_token,
+    account_type,
+    created_at
+"""
+
+# Колонки для COPY при импорте аккаунтов из старой системы
+account_import_columns = (
+    "login",
+    "password",
+    "refresh_token",
+    "account_type",
+    "created_at",
+)
+
 create_account = """
 INSERT INTO accounts (
     login,
@@ -9,16 +28,17 @@ VALUES (
     :password,
     :account_type
 )
+ON CONFLICT (login) DO NOTHING
 RETURNING id;
 """
 
-get_account_by_id = """
-SELECT * FROM accounts
+get_account_by_id = f"""
+SELECT {account_columns} FROM accounts
 WHERE id = :account_id;
 """
 
-get_account_by_login = """
-SELECT * FROM accounts
+get_account_by_login = f"""
+SELECT {account_columns} FROM accounts
 WHERE login = :login;
 """
 
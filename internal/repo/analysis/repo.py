@@ -1,4 +1,8 @@
-from internal import interface, model
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime
+
+from internal import common, interface, model
 from pkg.trace_wrapper import traced_method
 
 from .sql_query import *
@@ -35,48 +39,176 @@ class AnalysisRepo(interface.IAnalysisRepo):
         analysis_id = await self.db.insert(create_analysis, args)
         return analysis_id
 
+    @traced_method()
+    async def import_analyses(self, records: Iterable[tuple] | AsyncIterable[tuple]) -> int:
+        # Кортежи в порядке analysis_import_columns
+        return await self.db.copy_from("analyses", analysis_import_columns, records)
+
     @traced_method()
     async def get_analysis_by_id(self, analysis_id: int) -> list[model.Analysis]:
         args = {"analysis_id": analysis_id}
-        rows = await self.db.select(get_analysis_by_id, args)
+        # Точечное чтение после записи (скачивание свежего заключения) — с primary
+        rows = await self.db.select(get_analysis_by_id, args, use_primary=True)
         analyses = model.Analysis.serialize(rows) if rows else []
         return analyses
 
     @traced_method()
-    async def get_all_analyses(self) -> list[model.Analysis]:
-        args = {}
-        rows = await self.db.select(get_all_analyses, args)
+    async def get_analyses(
+        self,
+        analysis_filter: model.AnalysisFilter,
+        limit: int,
+        cursor: model.AnalysisCursor | None = None,
+    ) -> list[model.Analysis]:
+        where, args = self._filter_conditions(analysis_filter, cursor)
+        args["limit"] = limit
+        query = get_analyses + where + analyses_page_order
+
+        rows = await self.db.select(query, args)
         analyses = model.Analysis.serialize(rows) if rows else []
         return analyses
 
+    def read_snapshot(self) -> AbstractAsyncContextManager[None]:
+        # Несколько чтений на одной реплике в одном снимке (версия набора и страница)
+        return self.db.transaction(read_only=True)
+
+    @traced_method()
+    async def get_analyses_version(self, analysis_filter: model.AnalysisFilter) -> tuple[int, datetime | None]:
+        where, args = self._filter_conditions(analysis_filter)
+        rows = await self.db.select(get_analyses_version + where, args)
+        return rows[0].count, rows[0].max_updated_at
+
     @traced_method()
-    async def get_analyses_by_nurse(self, nurse_id: int) -> list[model.Analysis]:
-        args = {"nurse_id": nurse_id}
-        rows = await self.db.select(get_analyses_by_nurse, args)
+    async def get_analysis_changes(
+        self,
+        nurse_id: int | None,
+        watermark: model.AnalysisWatermark | None,
+        limit: int,
+        settle_seconds: float,
+    ) -> list[model.Analysis]:
+        conditions = [analyses_filter_settled]
+        args = {"settle_seconds": settle_seconds, "limit": limit}
+
+        if nurse_id is not None:
+            conditions.append(analyses_filter_nurse_id)
+            args["nurse_id"] = nurse_id
+        if watermark is not None:
+            conditions.append(analyses_filter_watermark)
+            args["watermark_updated_at"] = watermark.updated_at
+            args["watermark_id"] = watermark.id
+
+        query = get_analyses + "WHERE " + " AND ".join(conditions) + analyses_changes_order
+
+        # С реплики с лагом можно проскочить строку, закоммиченную позже окна — читаем с primary
+        rows = await self.db.select(query, args, use_primary=True)
         analyses = model.Analysis.serialize(rows) if rows else []
         return analyses
 
     @traced_method()
-    async def set_doctor_and_start(self, analysis_id: int, doctor_id: int) -> None:
+    async def set_doctor_and_start(self, analysis_id: int, doctor_id: int) -> model.Analysis:
         args = {
             "analysis_id": analysis_id,
             "doctor_id": doctor_id,
         }
-        await self.db.update(set_doctor_and_start, args)
+        rows = await self.db.execute_returning(set_doctor_and_start, args)
+        return self._transition_result(rows)
 
     @traced_method()
-    async def set_rejection(self, analysis_id: int, rejection_comment: str) -> None:
+    async def set_rejection(self, analysis_id: int, rejection_comment: str) -> model.Analysis:
         args = {
             "analysis_id": analysis_id,
             "rejection_comment": rejection_comment,
         }
-        await self.db.update(set_rejection, args)
+        rows = await self.db.execute_returning(set_rejection, args)
+        return self._transition_result(rows)
 
     @traced_method()
-    async def set_conclusion(self, analysis_id: int, conclusion_file_fid: str, conclusion_file_original_name: str) -> None:
+    async def set_conclusion(
+        self,
+        analysis_id: int,
+        conclusion_file_fid: str,
+        conclusion_file_original_name: str,
+    ) -> model.Analysis:
         args = {
             "analysis_id": analysis_id,
             "conclusion_file_fid": conclusion_file_fid,
             "conclusion_file_original_name": conclusion_file_original_name,
         }
-        await self.db.update(set_conclusion, args)
+        rows = await self.db.execute_returning(set_conclusion, args)
+        return self._transition_result(rows)
+
+    @traced_method()
+    async def claim_next_analysis(self, doctor_id: int, analysis_type: str | None = None) -> list[model.Analysis]:
+        args = {"doctor_id": doctor_id}
+        query = claim_next_analysis
+        if analysis_type:
+            args["analysis_type"] = analysis_type
+            query = claim_next_analysis_by_type
+
+        rows = await self.db.execute_returning(query, args)
+        analyses = model.Analysis.serialize(rows) if rows else []
+        return analyses
+
+    async def stream_analyses(
+        self,
+        analysis_filter: model.AnalysisFilter,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[list[model.Analysis]]:
+        where, args = self._filter_conditions(analysis_filter)
+        query = get_analyses + where + analyses_export_order
+
+        async for rows in self.db.stream(query, args, batch_size):
+            yield model.Analysis.serialize(rows)
+
+    def copy_analyses_csv(self, analysis_filter: model.AnalysisFilter) -> AsyncIterator[bytes]:
+        # CSV с заголовком целиком собирает Postgres: строки не проходят через модель
+        where, args = self._filter_conditions(analysis_filter)
+        query = get_analyses + where + analyses_copy_order
+
+        return self.db.copy_to(query, args, "csv")
+
+    @staticmethod
+    def _filter_conditions(
+        analysis_filter: model.AnalysisFilter,
+        cursor: model.AnalysisCursor | None = None,
+    ) -> tuple[str, dict]:
+        conditions = []
+        args = {}
+
+        if analysis_filter.status is not None:
+            conditions.append(analyses_filter_status)
+            args["status"] = analysis_filter.status
+        if analysis_filter.analysis_type is not None:
+            conditions.append(analyses_filter_analysis_type)
+            args["analysis_type"] = analysis_filter.analysis_type
+        if analysis_filter.nurse_id is not None:
+            conditions.append(analyses_filter_nurse_id)
+            args["nurse_id"] = analysis_filter.nurse_id
+        if analysis_filter.doctor_id is not None:
+            conditions.append(analyses_filter_doctor_id)
+            args["doctor_id"] = analysis_filter.doctor_id
+        if analysis_filter.created_from is not None:
+            conditions.append(analyses_filter_created_from)
+            args["created_from"] = analysis_filter.created_from
+        if analysis_filter.created_to is not None:
+            conditions.append(analyses_filter_created_to)
+            args["created_to"] = analysis_filter.created_to
+        if cursor is not None:
+            conditions.append(analyses_filter_cursor)
+            args["cursor_created_at"] = cursor.created_at
+            args["cursor_id"] = cursor.id
+
+        if not conditions:
+            return "", args
+
+        return "WHERE " + " AND ".join(conditions), args
+
+    @staticmethod
+    def _transition_result(rows) -> model.Analysis:
+        if not rows:
+            raise common.ErrAnalysisNotFound()
+
+        # Строка есть, но UPDATE не сработал — анализ не в ожидаемом статусе
+        if rows[0].id is None:
+            raise common.ErrAnalysisInvalidStatus()
+
+        return model.Analysis.serialize(rows)[0]
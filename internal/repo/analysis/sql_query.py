@@ -1,3 +1,42 @@
+# Колонки в порядке полей model.Analysis: модель собирается из строки позиционно
+analysis_columns = """
+    id,
+    nurse_id,
+    doctor_id,
+    analysis_type,
+    study_file_fid,
+    study_file_original_name,
+    activity_diary_image_fid,
+    activity_diary_original_name,
+    status,
+    conclusion_file_fid,
+    conclusion_file_original_name,
+    rejection_comment,
+    started_at,
+    finished_at,
+    created_at,
+    updated_at
+"""
+
+# Колонки для COPY при импорте анализов из старой системы
+analysis_import_columns = (
+    "nurse_id",
+    "doctor_id",
+    "analysis_type",
+    "study_file_fid",
+    "study_file_original_name",
+    "activity_diary_image_fid",
+    "activity_diary_original_name",
+    "status",
+    "conclusion_file_fid",
+    "conclusion_file_original_name",
+    "rejection_comment",
+    "started_at",
+    "finished_at",
+    "created_at",
+    "updated_at",
+)
+
 create_analysis = """
 INSERT INTO analyses (
     nurse_id,
@@ -36,46 +75,142 @@ VALUES (
 RETURNING id;
 """
 
-get_analysis_by_id = """
-SELECT * FROM analyses
+get_analysis_by_id = f"""
+SELECT {analysis_columns} FROM analyses
 WHERE id = :analysis_id;
 """
 
-get_all_analyses = """
-SELECT * FROM analyses
-ORDER BY created_at DESC;
+# Список анализов собирается из фиксированных фрагментов: набор условий конечен,
+# а сортировка по (created_at, id) позволяет листать keyset-курсором без OFFSET
+get_analyses = f"""
+SELECT {analysis_columns} FROM analyses
+"""
+
+# Версия отфильтрованного набора для ETag: анализы не удаляются, поэтому новая строка сдвигает count,
+# а переход статуса — max(updated_at). Оба агрегата берутся из индексов (фильтр, updated_at) миграции v0_0_7
+get_analyses_version = """
+SELECT
+    count(*) AS count,
+    max(updated_at) AS max_updated_at
+FROM analyses
+"""
+
+analyses_filter_status = "status = :status"
+analyses_filter_analysis_type = "analysis_type = :analysis_type"
+analyses_filter_nurse_id = "nurse_id = :nurse_id"
+analyses_filter_doctor_id = "doctor_id = :doctor_id"
+analyses_filter_created_from = "created_at >= :created_from"
+analyses_filter_created_to = "created_at < :created_to"
+analyses_filter_cursor = "(created_at, id) < (:cursor_created_at, :cursor_id)"
+
+analyses_page_order = """
+ORDER BY created_at DESC, id DESC
+LIMIT :limit;
+"""
+
+analyses_export_order = """
+ORDER BY created_at DESC, id DESC;
+"""
+
+# CSV-выгрузка идёт через COPY (query) TO STDOUT, внутри COPY точка с запятой недопустима
+analyses_copy_order = """
+ORDER BY created_at DESC, id DESC
 """
 
-get_analyses_by_nurse = """
-SELECT * FROM analyses
-WHERE nurse_id = :nurse_id
-ORDER BY created_at DESC;
+# Дельта-синхронизация идёт по возрастанию (updated_at, id) от водяного знака клиента.
+# updated_at — время начала транзакции, а не коммита: строки моложе окна ещё не отдаются,
+# иначе медленная транзакция закоммитит строку "позади" уже выданного водяного знака
+analyses_filter_watermark = "(updated_at, id) > (:watermark_updated_at, :watermark_id)"
+analyses_filter_settled = "updated_at < LOCALTIMESTAMP - make_interval(secs => :settle_seconds)"
+
+analyses_changes_order = """
+ORDER BY updated_at, id
+LIMIT :limit;
+"""
+
+# Переходы статуса — один запрос: UPDATE срабатывает только из ожидаемого статуса,
+# а LEFT JOIN к снимку строки отличает "не найден" (нет строк) от "не тот статус" (id IS NULL)
+set_doctor_and_start = f"""
+WITH current_analysis AS (
+    SELECT id FROM analyses
+    WHERE id = :analysis_id
+), updated_analysis AS (
+    UPDATE analyses
+    SET doctor_id = :doctor_id,
+        started_at = CURRENT_TIMESTAMP,
+        status = 'in_work',
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = :analysis_id AND status = 'pending'
+    RETURNING {analysis_columns}
+)
+SELECT updated_analysis.* FROM current_analysis
+LEFT JOIN updated_analysis ON updated_analysis.id = current_analysis.id;
+"""
+
+set_rejection = f"""
+WITH current_analysis AS (
+    SELECT id FROM analyses
+    WHERE id = :analysis_id
+), updated_analysis AS (
+    UPDATE analyses
+    SET status = 'rejected',
+        rejection_comment = :rejection_comment,
+        finished_at = CURRENT_TIMESTAMP,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = :analysis_id AND status = 'in_work'
+    RETURNING {analysis_columns}
+)
+SELECT updated_analysis.* FROM current_analysis
+LEFT JOIN updated_analysis ON updated_analysis.id = current_analysis.id;
+"""
+
+set_conclusion = f"""
+WITH current_analysis AS (
+    SELECT id FROM analyses
+    WHERE id = :analysis_id
+), updated_analysis AS (
+    UPDATE analyses
+    SET conclusion_file_fid = :conclusion_file_fid,
+        conclusion_file_original_name = :conclusion_file_original_name,
+        finished_at = CURRENT_TIMESTAMP,
+        status = 'completed',
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = :analysis_id AND status = 'in_work'
+    RETURNING {analysis_columns}
+)
+SELECT updated_analysis.* FROM current_analysis
+LEFT JOIN updated_analysis ON updated_analysis.id = current_analysis.id;
 """
 
-set_doctor_and_start = """
+# Очередь врачей: самый старый pending; строки, которые уже забирает другой врач, пропускаются
+claim_next_analysis = f"""
 UPDATE analyses
 SET doctor_id = :doctor_id,
     started_at = CURRENT_TIMESTAMP,
     status = 'in_work',
     updated_at = CURRENT_TIMESTAMP
-WHERE id = :analysis_id;
-"""
-
-set_rejection = """
-UPDATE analyses
-SET status = 'rejected',
-    rejection_comment = :rejection_comment,
-    finished_at = CURRENT_TIMESTAMP,
-    updated_at = CURRENT_TIMESTAMP
-WHERE id = :analysis_id;
+WHERE id = (
+    SELECT id FROM analyses
+    WHERE status = 'pending'
+    ORDER BY created_at, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING {analysis_columns};
 """
 
-set_conclusion = """
+claim_next_analysis_by_type = f"""
 UPDATE analyses
-SET conclusion_file_fid = :conclusion_file_fid,
-    conclusion_file_original_name = :conclusion_file_original_name,
-    finished_at = CURRENT_TIMESTAMP,
-    status = 'completed',
+SET doctor_id = :doctor_id,
+    started_at = CURRENT_TIMESTAMP,
+    status = 'in_work',
     updated_at = CURRENT_TIMESTAMP
-WHERE id = :analysis_id;
+WHERE id = (
+    SELECT id FROM analyses
+    WHERE status = 'pending' AND analysis_type = :analysis_type
+    ORDER BY created_at, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING {analysis_columns};
 """
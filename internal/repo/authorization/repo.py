@@ -12,7 +12,8 @@ class AuthorizationRepo(interface.IAuthorizationRepo):
     @traced_method()
     async def account_by_id(self, account_id: int) -> list[model.Account]:
         args = {'account_id': account_id}
-        rows = await self.db.select(account_by_id, args)
+        # Токены выдаются сразу после вставки аккаунта при регистрации — реплика может его ещё не видеть
+        rows = await self.db.select(account_by_id, args, use_primary=True)
         accounts = model.Account.serialize(rows) if rows else []
 
         return accounts
@@ -20,7 +21,8 @@ class AuthorizationRepo(interface.IAuthorizationRepo):
     @traced_method()
     async def account_by_refresh_token(self, refresh_token: str) -> list[model.Account]:
         args = {'refresh_token': refresh_token}
-        rows = await self.db.select(account_by_refresh_token, args)
+        # Токен только что выдан и записан на primary, реплика может его ещё не видеть
+        rows = await self.db.select(account_by_refresh_token, args, use_primary=True)
         accounts = model.Account.serialize(rows) if rows else []
 
         return accounts
@@ -1,10 +1,20 @@
-account_by_id = """
-SELECT * FROM accounts
+# Колонки в порядке полей model.Account: модель собирается из строки позиционно
+account_columns = """
+    id,
+    login,
+    password,
+    refresh_token,
+    account_type,
+    created_at
+"""
+
+account_by_id = f"""
+SELECT {account_columns} FROM accounts
 WHERE id = :account_id;
 """
 
-account_by_refresh_token = """
-SELECT * FROM accounts
+account_by_refresh_token = f"""
+SELECT {account_columns} FROM accounts
 WHERE refresh_token = :refresh_token;
 """
 
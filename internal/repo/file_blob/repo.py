@@ -0,0 +1,48 @@
+from internal import interface, model
+from pkg.trace_wrapper import traced_method
+
+from .sql_query import *
+
+
+class FileBlobRepo(interface.IFileBlobRepo):
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        db: interface.IDB,
+    ):
+        self.tracer = tel.tracer()
+        self.db = db
+
+    @traced_method()
+    async def acquire_blob(self, sha256: str) -> list[model.FileBlob]:
+        args = {"sha256": sha256}
+        rows = await self.db.execute_returning(acquire_blob, args)
+        blobs = model.FileBlob.serialize(rows) if rows else []
+        return blobs
+
+    @traced_method()
+    async def create_blob(self, sha256: str, fid: str, size: int) -> str:
+        args = {
+            "sha256": sha256,
+            "fid": fid,
+            "size": size,
+        }
+        rows = await self.db.execute_returning(create_blob, args)
+        return rows[0][0]
+
+    @traced_method()
+    async def release_blob(self, fid: str) -> int | None:
+        args = {"fid": fid}
+
+        # Уменьшение счётчика и удаление строки при нуле — одна транзакция:
+        # до коммита строка заблокирована, параллельный create_blob не увеличит обнулённый счётчик
+        async with self.db.transaction():
+            rows = await self.db.execute_returning(release_blob, args)
+            if not rows:
+                return None
+
+            remaining = rows[0][0]
+            if remaining == 0:
+                await self.db.execute_returning(delete_released_blob, args)
+
+        return remaining
@@ -0,0 +1,40 @@
+acquire_blob = """
+UPDATE file_blobs
+SET ref_count = ref_count + 1,
+    updated_at = CURRENT_TIMESTAMP
+WHERE sha256 = :sha256 AND ref_count > 0
+RETURNING *;
+"""
+
+create_blob = """
+INSERT INTO file_blobs (
+    sha256,
+    fid,
+    size,
+    ref_count
+)
+VALUES (
+    :sha256,
+    :fid,
+    :size,
+    1
+)
+ON CONFLICT (sha256) DO UPDATE
+SET ref_count = file_blobs.ref_count + 1,
+    updated_at = CURRENT_TIMESTAMP
+RETURNING fid;
+"""
+
+release_blob = """
+UPDATE file_blobs
+SET ref_count = ref_count - 1,
+    updated_at = CURRENT_TIMESTAMP
+WHERE fid = :fid AND ref_count > 0
+RETURNING ref_count;
+"""
+
+delete_released_blob = """
+DELETE FROM file_blobs
+WHERE fid = :fid AND ref_count = 0
+RETURNING fid;
+"""
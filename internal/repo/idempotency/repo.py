@@ -0,0 +1,72 @@
+from internal import interface, model
+from pkg.trace_wrapper import traced_method
+
+from .sql_query import *
+
+
+class IdempotencyRepo(interface.IIdempotencyRepo):
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        db: interface.IDB,
+    ):
+        self.tracer = tel.tracer()
+        self.db = db
+
+    @traced_method()
+    async def claim_key(
+            self,
+            account_id: int,
+            operation: str,
+            idempotency_key: str,
+            request_fingerprint: str,
+            lock_ttl: int,
+            key_ttl: int,
+    ) -> int | None:
+        args = {
+            "account_id": account_id,
+            "operation": operation,
+            "idempotency_key": idempotency_key,
+            "request_fingerprint": request_fingerprint,
+            "lock_ttl": lock_ttl,
+            "key_ttl": key_ttl,
+        }
+        rows = await self.db.execute_returning(claim_idempotency_key, args)
+        return rows[0][0] if rows else None
+
+    @traced_method()
+    async def get_key(self, account_id: int, operation: str, idempotency_key: str) -> list[model.IdempotencyKey]:
+        args = {
+            "account_id": account_id,
+            "operation": operation,
+            "idempotency_key": idempotency_key,
+        }
+        rows = await self.db.select(get_idempotency_key, args, use_primary=True)
+        keys = model.IdempotencyKey.serialize(rows) if rows else []
+        return keys
+
+    @traced_method()
+    async def complete_key(self, key_id: int, response_status_code: int, response_body: str) -> None:
+        args = {
+            "key_id": key_id,
+            "response_status_code": response_status_code,
+            "response_body": response_body,
+        }
+        await self.db.update(complete_idempotency_key, args)
+
+    @traced_method()
+    async def extend_key(self, key_id: int, lock_ttl: int) -> None:
+        args = {
+            "key_id": key_id,
+            "lock_ttl": lock_ttl,
+        }
+        await self.db.update(extend_idempotency_key, args)
+
+    @traced_method()
+    async def release_key(self, key_id: int) -> None:
+        args = {"key_id": key_id}
+        await self.db.delete(release_idempotency_key, args)
+
+    @traced_method()
+    async def delete_expired_keys(self) -> None:
+        await self.db.delete(delete_expired_idempotency_keys, {})
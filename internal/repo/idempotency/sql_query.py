@@ -0,0 +1,66 @@
+claim_idempotency_key = """
+INSERT INTO idempotency_keys (
+    account_id,
+    operation,
+    idempotency_key,
+    request_fingerprint,
+    status,
+    locked_until,
+    expires_at
+)
+VALUES (
+    :account_id,
+    :operation,
+    :idempotency_key,
+    :request_fingerprint,
+    'in_flight',
+    CURRENT_TIMESTAMP + make_interval(secs => :lock_ttl),
+    CURRENT_TIMESTAMP + make_interval(secs => :key_ttl)
+)
+ON CONFLICT (account_id, operation, idempotency_key) DO UPDATE
+SET status = 'in_flight',
+    request_fingerprint = EXCLUDED.request_fingerprint,
+    response_status_code = NULL,
+    response_body = NULL,
+    locked_until = EXCLUDED.locked_until,
+    expires_at = EXCLUDED.expires_at,
+    updated_at = CURRENT_TIMESTAMP
+WHERE idempotency_keys.expires_at < CURRENT_TIMESTAMP
+   OR (idempotency_keys.status = 'in_flight' AND idempotency_keys.locked_until < CURRENT_TIMESTAMP)
+RETURNING id;
+"""
+
+get_idempotency_key = """
+SELECT * FROM idempotency_keys
+WHERE account_id = :account_id
+  AND operation = :operation
+  AND idempotency_key = :idempotency_key
+  AND expires_at >= CURRENT_TIMESTAMP;
+"""
+
+complete_idempotency_key = """
+UPDATE idempotency_keys
+SET status = 'completed',
+    response_status_code = :response_status_code,
+    response_body = :response_body,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = :key_id;
+"""
+
+# Владелец продлевает захват, пока операция выполняется
+extend_idempotency_key = """
+UPDATE idempotency_keys
+SET locked_until = CURRENT_TIMESTAMP + make_interval(secs => :lock_ttl),
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = :key_id AND status = 'in_flight';
+"""
+
+release_idempotency_key = """
+DELETE FROM idempotency_keys
+WHERE id = :key_id AND status = 'in_flight';
+"""
+
+delete_expired_idempotency_keys = """
+DELETE FROM idempotency_keys
+WHERE expires_at < CURRENT_TIMESTAMP;
+"""
@@ -1,10 +1,70 @@
-import io
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import AsyncIterator
+from dataclasses import asdict
+from datetime import datetime
 
 from fastapi import UploadFile
 
 from internal import common, interface, model
+from pkg.storage_batch import delete_uploaded, upload_files
 from pkg.trace_wrapper import traced_method
 
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 500
+EXPORT_BATCH_SIZE = 1000
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 1000
+CHANGES_SETTLE_SECONDS = 2
+
+
+def _encode_position(at: datetime, analysis_id: int) -> str:
+    payload = json.dumps([at.isoformat(), analysis_id]).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def _decode_position(token: str) -> tuple[datetime, int]:
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        at, analysis_id = json.loads(payload)
+        return datetime.fromisoformat(at), int(analysis_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise common.ErrInvalidCursor()
+
+
+def encode_analysis_cursor(cursor: model.AnalysisCursor) -> str:
+    """Непрозрачный курсор страницы: base64 от позиции последней строки в (created_at, id)"""
+    return _encode_position(cursor.created_at, cursor.id)
+
+
+def decode_analysis_cursor(cursor: str) -> model.AnalysisCursor:
+    created_at, analysis_id = _decode_position(cursor)
+    return model.AnalysisCursor(created_at=created_at, id=analysis_id)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110): префикс W/ не учитывается"""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+def encode_analysis_watermark(watermark: model.AnalysisWatermark) -> str:
+    """Водяной знак дельта-синхронизации: позиция последней выданной строки в (updated_at, id)"""
+    return _encode_position(watermark.updated_at, watermark.id)
+
+
+def decode_analysis_watermark(watermark: str) -> model.AnalysisWatermark:
+    updated_at, analysis_id = _decode_position(watermark)
+    return model.AnalysisWatermark(updated_at=updated_at, id=analysis_id)
+
 
 class AnalysisService(interface.IAnalysisService):
     def __init__(
@@ -26,92 +86,200 @@ class AnalysisService(interface.IAnalysisService):
             study_file: UploadFile,
             activity_diary_image: UploadFile | None,
     ) -> int:
-        study_file_content = await study_file.read()
-        study_file_bytes = io.BytesIO(study_file_content)
         study_file_original_name = study_file.filename or "study_file"
-        study_file_result = await self.storage.upload(study_file_bytes, study_file_original_name)
-        study_file_fid = study_file_result.fid
+        files = [(study_file.file, study_file_original_name)]
 
-        activity_diary_fid = None
         activity_diary_original_name = None
         if activity_diary_image:
-            diary_content = await activity_diary_image.read()
-            diary_bytes = io.BytesIO(diary_content)
             activity_diary_original_name = activity_diary_image.filename or "activity_diary"
-            diary_result = await self.storage.upload(diary_bytes, activity_diary_original_name)
-            activity_diary_fid = diary_result.fid
-
-        analysis_id = await self.analysis_repo.create_analysis(
-            nurse_id=nurse_id,
-            analysis_type=analysis_type,
-            study_file_fid=study_file_fid,
-            study_file_original_name=study_file_original_name,
-            activity_diary_image_fid=activity_diary_fid,
-            activity_diary_original_name=activity_diary_original_name,
-        )
+            files.append((activity_diary_image.file, activity_diary_original_name))
+
+        # Файлы грузятся параллельно; при ошибке одного второй удаляется
+        upload_results = await upload_files(self.storage, files, self.logger)
+        study_file_fid = upload_results[0].fid
+        activity_diary_fid = upload_results[1].fid if activity_diary_image else None
+
+        try:
+            analysis_id = await self.analysis_repo.create_analysis(
+                nurse_id=nurse_id,
+                analysis_type=analysis_type,
+                study_file_fid=study_file_fid,
+                study_file_original_name=study_file_original_name,
+                activity_diary_image_fid=activity_diary_fid,
+                activity_diary_original_name=activity_diary_original_name,
+            )
+        except Exception:
+            await delete_uploaded(self.storage, upload_results, self.logger)
+            raise
 
         return analysis_id
 
     @traced_method()
     async def take_analysis(self, doctor_id: int, analysis_id: int) -> model.Analysis:
-        analyses = await self.analysis_repo.get_analysis_by_id(analysis_id)
-        if not analyses:
-            raise common.ErrAnalysisNotFound()
-
-        analysis = analyses[0]
+        # Проверка статуса и обновление — один условный UPDATE, второй доктор получит ErrAnalysisInvalidStatus
+        analysis = await self.analysis_repo.set_doctor_and_start(analysis_id, doctor_id)
+        return analysis
 
-        if analysis.status != "pending":
-            raise common.ErrAnalysisInvalidStatus()
-
-        await self.analysis_repo.set_doctor_and_start(analysis_id, doctor_id)
-
-        updated_analyses = await self.analysis_repo.get_analysis_by_id(analysis_id)
-        return updated_analyses[0]
+    @traced_method()
+    async def claim_next_analysis(self, doctor_id: int, analysis_type: str | None = None) -> model.Analysis | None:
+        analyses = await self.analysis_repo.claim_next_analysis(doctor_id, analysis_type)
+        return analyses[0] if analyses else None
 
     @traced_method()
     async def reject_analysis(self, analysis_id: int, rejection_comment: str) -> None:
-        analyses = await self.analysis_repo.get_analysis_by_id(analysis_id)
-        if not analyses:
-            raise common.ErrAnalysisNotFound()
-
-        analysis = analyses[0]
-
-        if analysis.status != "in_work":
-            raise common.ErrAnalysisInvalidStatus()
-
         await self.analysis_repo.set_rejection(analysis_id, rejection_comment)
 
     @traced_method()
     async def complete_analysis(self, analysis_id: int, conclusion_file: UploadFile) -> None:
+        # Дешёвая проверка до загрузки: повторное или запоздалое завершение не стоит загрузки и удаления файла.
+        # Гонку по-прежнему решает условный UPDATE в set_conclusion
         analyses = await self.analysis_repo.get_analysis_by_id(analysis_id)
         if not analyses:
             raise common.ErrAnalysisNotFound()
-
-        analysis = analyses[0]
-
-        if analysis.status != "in_work":
+        if analyses[0].status != "in_work":
             raise common.ErrAnalysisInvalidStatus()
 
-        conclusion_content = await conclusion_file.read()
-        conclusion_bytes = io.BytesIO(conclusion_content)
         conclusion_original_name = conclusion_file.filename or "conclusion"
-        conclusion_result = await self.storage.upload(conclusion_bytes, conclusion_original_name)
-        conclusion_fid = conclusion_result.fid
+        conclusion_result = await self.storage.upload_stream(conclusion_file.file, conclusion_original_name)
 
-        await self.analysis_repo.set_conclusion(analysis_id, conclusion_fid, conclusion_original_name)
+        # Статус проверяется атомарно при записи заключения; если переход не удался, загруженный файл удаляется
+        try:
+            await self.analysis_repo.set_conclusion(analysis_id, conclusion_result.fid, conclusion_original_name)
+        except Exception:
+            await delete_uploaded(self.storage, [conclusion_result], self.logger)
+            raise
 
     @traced_method()
-    async def get_all_analyses(self) -> list[model.Analysis]:
-        analyses = await self.analysis_repo.get_all_analyses()
-        return analyses
+    async def get_all_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            limit: int = DEFAULT_PAGE_LIMIT,
+            cursor: str | None = None,
+            if_none_match: str | None = None,
+    ) -> model.AnalysesPage:
+        return await self._get_analyses_page(analysis_filter, limit, cursor, if_none_match)
 
     @traced_method()
-    async def get_analyses_by_nurse(self, nurse_id: int) -> list[model.Analysis]:
-        analyses = await self.analysis_repo.get_analyses_by_nurse(nurse_id)
-        return analyses
+    async def get_analyses_by_nurse(
+            self,
+            nurse_id: int,
+            analysis_filter: model.AnalysisFilter,
+            limit: int = DEFAULT_PAGE_LIMIT,
+            cursor: str | None = None,
+            if_none_match: str | None = None,
+    ) -> model.AnalysesPage:
+        analysis_filter.nurse_id = nurse_id
+        return await self._get_analyses_page(analysis_filter, limit, cursor, if_none_match)
+
+    async def _get_analyses_page(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            limit: int,
+            cursor: str | None,
+            if_none_match: str | None,
+    ) -> model.AnalysesPage:
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+
+        # Страницы по курсору не версионируются: клиент опрашивает первую страницу,
+        # а агрегат по всему набору на каждой странице сделал бы листание O(N)
+        if cursor:
+            analyses = await self.analysis_repo.get_analyses(analysis_filter, limit + 1, decode_analysis_cursor(cursor))
+            return self._analyses_page(analyses, limit, etag=None)
+
+        # Версия и страница читаются в одном снимке: иначе свежий ETag может уйти со строками
+        # с отстающей реплики, и клиент будет получать 304 на устаревшую страницу
+        async with self.analysis_repo.read_snapshot():
+            version = await self.analysis_repo.get_analyses_version(analysis_filter)
+            etag = self._analyses_etag(version, analysis_filter, limit)
+
+            # Набор не менялся — 304 без выборки и сериализации строк
+            if etag_matches(if_none_match, etag):
+                return model.AnalysesPage(analyses=[], next_cursor=None, etag=etag, not_modified=True)
+
+            analyses = await self.analysis_repo.get_analyses(analysis_filter, limit + 1)
+
+        return self._analyses_page(analyses, limit, etag)
+
+    @staticmethod
+    def _analyses_page(analyses: list[model.Analysis], limit: int, etag: str | None) -> model.AnalysesPage:
+        # Берём на одну строку больше, чтобы без COUNT понять, есть ли следующая страница
+        next_cursor = None
+        if len(analyses) > limit:
+            analyses = analyses[:limit]
+            last = analyses[-1]
+            next_cursor = encode_analysis_cursor(model.AnalysisCursor(created_at=last.created_at, id=last.id))
+
+        return model.AnalysesPage(analyses=analyses, next_cursor=next_cursor, etag=etag)
+
+    @staticmethod
+    def _analyses_etag(
+            version: tuple[int, datetime | None],
+            analysis_filter: model.AnalysisFilter,
+            limit: int,
+    ) -> str:
+        """Слабый ETag первой страницы: версия отфильтрованного набора плюс фильтр и лимит"""
+        payload = json.dumps([*version, asdict(analysis_filter), limit], default=str).encode()
+        return f'W/"{hashlib.sha1(payload).hexdigest()}"'
+
+    async def export_analyses(
+            self,
+            analysis_filter: model.AnalysisFilter,
+            export_format: str = "ndjson",
+    ) -> AsyncIterator[bytes]:
+        """
+        Выгрузка анализов потоком. CSV отдаёт сам Postgres через COPY TO STDOUT;
+        ndjson — пачками серверного курсора, одна пачка — один чанк ответа
+        """
+        if export_format == "csv":
+            async for chunk in self.analysis_repo.copy_analyses_csv(analysis_filter):
+                yield chunk
+            return
+
+        async for analyses in self.analysis_repo.stream_analyses(analysis_filter, EXPORT_BATCH_SIZE):
+            lines = [json.dumps(analysis.to_dict(), ensure_ascii=False) + "\n" for analysis in analyses]
+            yield "".join(lines).encode("utf-8")
+
+    @traced_method()
+    async def get_analysis_changes(
+            self,
+            nurse_id: int | None,
+            since: str | None = None,
+            limit: int = DEFAULT_CHANGES_LIMIT,
+    ) -> tuple[list[model.Analysis], str | None, bool]:
+        """
+        Анализы, изменённые после водяного знака since (без since — всё с начала).
+        Возвращает изменения, новый водяной знак и признак, что изменений больше лимита.
+        """
+        limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+        watermark = decode_analysis_watermark(since) if since else None
+
+        analyses = await self.analysis_repo.get_analysis_changes(
+            nurse_id,
+            watermark,
+            limit + 1,
+            CHANGES_SETTLE_SECONDS,
+        )
+
+        has_more = len(analyses) > limit
+        if has_more:
+            analyses = analyses[:limit]
+
+        # Нет изменений — клиент остаётся на прежнем водяном знаке
+        if not analyses:
+            return analyses, since, False
+
+        last = analyses[-1]
+        next_watermark = encode_analysis_watermark(model.AnalysisWatermark(updated_at=last.updated_at, id=last.id))
+        return analyses, next_watermark, has_more
 
     @traced_method()
-    async def get_analysis_file(self, analysis_id: int, file_type: str) -> tuple[io.BytesIO, str, str]:
+    async def get_analysis_file(
+            self,
+            analysis_id: int,
+            file_type: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> tuple[model.AsyncWeedDownloadStream, str]:
         analyses = await self.analysis_repo.get_analysis_by_id(analysis_id)
         if not analyses:
             raise common.ErrAnalysisNotFound()
@@ -134,7 +302,7 @@ class AnalysisService(interface.IAnalysisService):
         if not fid:
             raise common.ErrAnalysisNotFound()
 
-        # Скачиваем файл из storage
-        file_obj, content_type = await self.storage.download(fid, filename)
+        # Открываем поток из storage, тело читается уже при отдаче клиенту
+        file_stream = await self.storage.download_stream(fid, filename, range_header, if_range)
 
-        return file_obj, content_type, filename
+        return file_stream, filename
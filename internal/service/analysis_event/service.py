@@ -0,0 +1,92 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from internal import interface, model
+
+ANALYSIS_EVENTS_CHANNEL = "analysis_events"
+
+
+@dataclass(eq=False)
+class Subscriber:
+    account_id: int
+    account_type: str
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+    def wants(self, event: model.AnalysisEvent) -> bool:
+        if event.kind != "analysis" or self.account_type == "doctor":
+            return True
+        # Медсестра видит только свои анализы
+        return self.account_type == "nurse" and event.nurse_id == self.account_id
+
+
+class AnalysisEventService(interface.IAnalysisEventService):
+    """
+    Раздача изменений анализов подключённым клиентам.
+    На процесс одно LISTEN-соединение с Postgres, события расходятся по очередям подписчиков.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db: interface.IDB,
+            queue_size: int = 100,
+    ):
+        self.logger = tel.logger()
+        self.db = db
+        self.queue_size = queue_size
+
+        self._subscribers: set[Subscriber] = set()
+        self._listener_task: asyncio.Task | None = None
+
+    async def events(
+            self,
+            account_id: int,
+            account_type: str,
+            keepalive_interval: float = 15,
+    ) -> AsyncIterator[model.AnalysisEvent | None]:
+        """События для подписчика; None — пауза дольше keepalive_interval, пора отправить keepalive"""
+        self._ensure_listener()
+
+        subscriber = Subscriber(account_id, account_type, asyncio.Queue(maxsize=self.queue_size))
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def _ensure_listener(self) -> None:
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(
+                self.db.listen(ANALYSIS_EVENTS_CHANNEL, self._on_notify, self._on_reconnect)
+            )
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            event = model.AnalysisEvent.from_notify(json.loads(payload))
+        except (TypeError, ValueError) as err:
+            self.logger.warning(f"Некорректное уведомление {ANALYSIS_EVENTS_CHANNEL}: {err}")
+            return
+
+        for subscriber in self._subscribers:
+            if subscriber.wants(event):
+                self._publish(subscriber, event)
+
+    def _on_reconnect(self) -> None:
+        for subscriber in self._subscribers:
+            self._publish(subscriber, model.AnalysisEvent(kind="resync"))
+
+    @staticmethod
+    def _publish(subscriber: Subscriber, event: model.AnalysisEvent) -> None:
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: вместо накопленных событий просим его перечитать список
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(model.AnalysisEvent(kind="resync"))
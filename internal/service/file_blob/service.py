@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import io
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import BinaryIO
+
+from internal import interface, model
+from pkg.trace_wrapper import traced_method
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class FileBlobService(interface.IStorage):
+    """
+    Дедупликация файлов по SHA-256 поверх storage.
+    Одинаковое содержимое хранится один раз, таблица file_blobs считает ссылки на fid.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            file_blob_repo: interface.IFileBlobRepo,
+            storage: interface.IStorage,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.file_blob_repo = file_blob_repo
+        self.storage = storage
+
+    @traced_method()
+    async def upload(self, file: io.BytesIO, name: str) -> model.AsyncWeedOperationResponse:
+        return await self.upload_stream(file, name)
+
+    @traced_method()
+    async def upload_stream(
+            self,
+            stream: AsyncIterable[bytes] | BinaryIO,
+            name: str,
+    ) -> model.AsyncWeedOperationResponse:
+        if isinstance(stream, AsyncIterable):
+            # У итератора хэш известен только после прохода байтов, поэтому считаем его по ходу загрузки
+            digest = hashlib.sha256()
+            result = await self.storage.upload_stream(self._hashing(stream, digest), name)
+            return await self._register_blob(digest.hexdigest(), result)
+
+        # Файл уже лежит локально (spooled UploadFile): хэшируем его до загрузки, чтобы дубликат не грузить вовсе
+        sha256, size = await asyncio.to_thread(self._hash_file, stream)
+
+        blobs = await self.file_blob_repo.acquire_blob(sha256)
+        if blobs:
+            self.logger.info("Файл уже есть в storage, загрузка пропущена")
+            return model.AsyncWeedOperationResponse(
+                status_code=200,
+                content=b"",
+                content_type="",
+                headers={},
+                fid=blobs[0].fid,
+                size=blobs[0].size,
+            )
+
+        result = await self.storage.upload_stream(stream, name)
+        return await self._register_blob(sha256, result)
+
+    @traced_method()
+    async def delete(self, fid: str, name: str):
+        remaining = await self.file_blob_repo.release_blob(fid)
+        if remaining is None:
+            # Файл загружен до дедупликации — удаляем напрямую
+            return await self.storage.delete(fid, name)
+
+        # Последняя ссылка: строка уже удалена вместе с уменьшением счётчика
+        if remaining == 0:
+            return await self.storage.delete(fid, name)
+
+        return None
+
+    @traced_method()
+    async def update(self, file: io.BytesIO, fid: str, name: str) -> model.AsyncWeedOperationResponse:
+        """
+        После дедупликации fid может быть общим для нескольких записей, поэтому на месте его не перезаписываем:
+        новое содержимое получает свой fid (или ссылку на такой же файл), а ссылка на старый освобождается.
+        Вызывающий должен сохранить fid из ответа.
+        """
+        result = await self.upload_stream(file, name)
+        if result.fid != fid:
+            await self.delete(fid, name)
+        return result
+
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+        return await self.storage.download(fid, name)
+
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            range_header: str | None = None,
+            if_range: str | None = None,
+    ) -> model.AsyncWeedDownloadStream:
+        return await self.storage.download_stream(fid, name, range_header, if_range)
+
+    async def _register_blob(
+            self,
+            sha256: str,
+            result: model.AsyncWeedOperationResponse,
+    ) -> model.AsyncWeedOperationResponse:
+        fid = await self.file_blob_repo.create_blob(sha256, result.fid, result.size or 0)
+        if fid != result.fid:
+            # Такой же файл параллельно загрузил другой запрос — оставляем его копию, свою удаляем
+            try:
+                await self.storage.delete(result.fid, "")
+            except Exception as err:
+                self.logger.warning(f"Не удалось удалить дубликат файла {result.fid}: {err}")
+            result.fid = fid
+        return result
+
+    @staticmethod
+    async def _hashing(stream: AsyncIterable[bytes], digest) -> AsyncIterator[bytes]:
+        async for chunk in stream:
+            digest.update(chunk)
+            yield chunk
+
+    @staticmethod
+    def _hash_file(file: BinaryIO) -> tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+
+        file.seek(0)
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        file.seek(0)
+
+        return digest.hexdigest(), size
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from collections.abc import Awaitable, Callable
+
+from internal import common, interface, model
+from pkg.trace_wrapper import traced_method
+
+POLL_INTERVAL = 0.2
+PURGE_INTERVAL = 3600
+SAVE_ATTEMPTS = 3
+SAVE_RETRY_DELAY = 0.5
+
+
+class IdempotencyService(interface.IIdempotencyService):
+    """
+    Повторы запроса с тем же Idempotency-Key получают сохранённый первый ответ.
+    Ключ захватывается в Postgres атомарно: владелец выполняет операцию, остальные ждут её результата.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            idempotency_repo: interface.IIdempotencyRepo,
+            key_ttl: int = 86400,
+            lock_ttl: int = 300,
+            wait_timeout: int = 30,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.idempotency_repo = idempotency_repo
+
+        # Сколько хранится ответ, сколько живёт захват незавершённой операции и сколько ждёт дубль
+        self.key_ttl = key_ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+
+        self._last_purge = 0.0
+
+    @traced_method()
+    async def execute(
+            self,
+            account_id: int,
+            operation: str,
+            idempotency_key: str,
+            request_fingerprint: str,
+            handler: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> model.IdempotentResponse:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+
+        while True:
+            key_id = await self.idempotency_repo.claim_key(
+                account_id,
+                operation,
+                idempotency_key,
+                request_fingerprint,
+                self.lock_ttl,
+                self.key_ttl,
+            )
+            if key_id is not None:
+                return await self._execute_owned(key_id, handler)
+
+            keys = await self.idempotency_repo.get_key(account_id, operation, idempotency_key)
+
+            # Тот же ключ с другим запросом — ошибка клиента, а не повтор
+            if keys and keys[0].request_fingerprint and keys[0].request_fingerprint != request_fingerprint:
+                raise common.ErrIdempotencyKeyReused()
+
+            if keys and keys[0].status == "completed":
+                return model.IdempotentResponse(
+                    status_code=keys[0].response_status_code,
+                    content=json.loads(keys[0].response_body),
+                    replayed=True,
+                )
+
+            # Ключ занят операцией в процессе; если владелец упадёт, ключ освободится и захватится заново
+            if loop.time() >= deadline:
+                raise common.ErrIdempotencyKeyInFlight()
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _execute_owned(
+            self,
+            key_id: int,
+            handler: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> model.IdempotentResponse:
+        # Захват продлевается, пока идёт операция и сохранение ответа: загрузка может длиться дольше lock_ttl
+        heartbeat = asyncio.create_task(self._keep_locked(key_id))
+        try:
+            try:
+                status_code, content = await handler()
+            except (Exception, asyncio.CancelledError):
+                # Неудачная операция не запоминается, чтобы повтор выполнил её заново
+                await asyncio.shield(self.idempotency_repo.release_key(key_id))
+                raise
+
+            await self._save_response(key_id, status_code, content)
+        finally:
+            heartbeat.cancel()
+
+        await self._purge_expired()
+
+        return model.IdempotentResponse(status_code=status_code, content=content)
+
+    async def _keep_locked(self, key_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await self.idempotency_repo.extend_key(key_id, self.lock_ttl)
+            except Exception as err:
+                self.logger.warning(f"Не удалось продлить захват ключа идемпотентности {key_id}: {err}")
+
+    async def _save_response(self, key_id: int, status_code: int, content: dict) -> None:
+        for attempt in range(SAVE_ATTEMPTS):
+            try:
+                await self.idempotency_repo.complete_key(key_id, status_code, json.dumps(content))
+                return
+            except Exception as err:
+                self.logger.warning(
+                    f"Не удалось сохранить ответ для ключа идемпотентности {key_id} "
+                    f"(попытка {attempt + 1} из {SAVE_ATTEMPTS}): {err}"
+                )
+                if attempt + 1 < SAVE_ATTEMPTS:
+                    await asyncio.sleep(SAVE_RETRY_DELAY * 2 ** attempt)
+
+        # Ответ не сохранён: ключ освобождается сразу, а не висит в in_flight до истечения lock_ttl.
+        # Повтор с этим ключом выполнит операцию ещё раз
+        self.logger.error(
+            f"Ответ для ключа идемпотентности {key_id} не сохранён, ключ освобождён: "
+            "повтор запроса выполнит операцию заново"
+        )
+        try:
+            await self.idempotency_repo.release_key(key_id)
+        except Exception as err:
+            self.logger.error(f"Не удалось освободить ключ идемпотентности {key_id}: {err}")
+
+    async def _purge_expired(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+
+        self._last_purge = now
+        try:
+            await self.idempotency_repo.delete_expired_keys()
+        except Exception as err:
+            self.logger.warning(f"Не удалось удалить просроченные ключи идемпотентности: {err}")
@@ -2,6 +2,7 @@ from contextvars import ContextVar
 
 import uvicorn
 
+from infrastructure.disk_cache.disk_cache import DiskCacheStorage
 from infrastructure.pg.pg import PG
 from infrastructure.telemetry.telemetry import AlertManager, Telemetry
 from infrastructure.weedfs.weedfs import AsyncWeed
@@ -14,9 +15,14 @@ from internal.controller.http.middlerware.middleware import HttpMiddleware
 from internal.repo.account.repo import AccountRepo
 from internal.repo.analysis.repo import AnalysisRepo
 from internal.repo.authorization.repo import AuthorizationRepo
+from internal.repo.file_blob.repo import FileBlobRepo
+from internal.repo.idempotency.repo import IdempotencyRepo
 from internal.service.account.service import AccountService
 from internal.service.analysis.service import AnalysisService
+from internal.service.analysis_event.service import AnalysisEventService
 from internal.service.authorization.service import AuthorizationService
+from internal.service.file_blob.service import FileBlobService
+from internal.service.idempotency.service import IdempotencyService
 from pkg.client.internal.emu_authorization.client import EmuAuthorizationClient
 
 cfg = Config()
@@ -48,7 +54,23 @@ tel = Telemetry(
 )
 
 # Инициализация клиентов
-db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+db = PG(
+    tel,
+    cfg.db_user,
+    cfg.db_pass,
+    cfg.db_host,
+    cfg.db_port,
+    cfg.db_name,
+    raw_asyncpg=cfg.db_raw_asyncpg,
+    statement_cache_size=cfg.db_statement_cache_size,
+    replica_hosts=cfg.db_replica_hosts,
+    replica_max_lag=cfg.db_replica_max_lag,
+    replica_check_interval=cfg.db_replica_check_interval,
+    pool_size=cfg.db_pool_size,
+    max_overflow=cfg.db_pool_max_overflow,
+    pool_timeout=cfg.db_pool_timeout,
+    pool_recycle=cfg.db_pool_recycle,
+)
 
 emu_authorization_client = EmuAuthorizationClient(
     tel=tel,
@@ -57,12 +79,33 @@ emu_authorization_client = EmuAuthorizationClient(
     log_context=log_context,
 )
 
-storage = AsyncWeed(cfg.weedfs_host, cfg.weedfs_port)
+storage = AsyncWeed(
+    tel,
+    cfg.weedfs_host,
+    cfg.weedfs_port,
+    volume_cache_ttl=cfg.weedfs_volume_cache_ttl,
+    volume_cache_size=cfg.weedfs_volume_cache_size,
+    fid_batch_size=cfg.weedfs_fid_batch_size,
+    fid_low_water=cfg.weedfs_fid_low_water,
+    fid_lease_ttl=cfg.weedfs_fid_lease_ttl,
+    hedged_reads=cfg.weedfs_hedged_reads,
+    hedge_min_delay=cfg.weedfs_hedge_min_delay,
+)
+
+if cfg.disk_cache_dir:
+    storage = DiskCacheStorage(
+        tel=tel,
+        storage=storage,
+        cache_dir=cfg.disk_cache_dir,
+        max_bytes=cfg.disk_cache_max_bytes,
+    )
 
 # Инициализация репозиториев
 account_repo = AccountRepo(tel, db)
 authorization_repo = AuthorizationRepo(tel, db)
 analysis_repo = AnalysisRepo(tel, db)
+file_blob_repo = FileBlobRepo(tel, db)
+idempotency_repo = IdempotencyRepo(tel, db)
 
 # Инициализация сервисов
 account_service = AccountService(
@@ -78,19 +121,42 @@ authorization_service = AuthorizationService(
     jwt_secret_key=cfg.jwt_secret_key,
 )
 
+file_blob_service = FileBlobService(
+    tel=tel,
+    file_blob_repo=file_blob_repo,
+    storage=storage,
+)
+
+idempotency_service = IdempotencyService(
+    tel=tel,
+    idempotency_repo=idempotency_repo,
+    key_ttl=cfg.idempotency_key_ttl,
+    lock_ttl=cfg.idempotency_lock_ttl,
+    wait_timeout=cfg.idempotency_wait_timeout,
+)
+
 analysis_service = AnalysisService(
     tel=tel,
     analysis_repo=analysis_repo,
-    storage=storage,
+    storage=file_blob_service,
 )
 
+analysis_event_service = AnalysisEventService(tel=tel, db=db)
+
 # Инициализация контроллеров
 account_controller = AccountController(tel, account_service, cfg.interserver_secret_key)
 authorization_controller = AuthorizationController(tel, authorization_service, cfg.prefix)
-analysis_controller = AnalysisController(tel, analysis_service)
+analysis_controller = AnalysisController(tel, analysis_service, idempotency_service, analysis_event_service)
 
 # Инициализация middleware
-http_middleware = HttpMiddleware(tel, emu_authorization_client, cfg.prefix, log_context)
+http_middleware = HttpMiddleware(
+    tel,
+    emu_authorization_client,
+    authorization_service,
+    cfg.prefix,
+    log_context,
+    cfg.auth_verify_mode,
+)
 
 app = NewHTTP(
     db=db,
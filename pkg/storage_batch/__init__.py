@@ -0,0 +1 @@
+from pkg.storage_batch.storage_batch import delete_uploaded, run_storage_operations, upload_files
@@ -0,0 +1,66 @@
+import asyncio
+from collections.abc import AsyncIterable, Awaitable, Callable
+from typing import Any, BinaryIO
+
+from internal import interface, model
+
+
+async def run_storage_operations(
+    operations: list[Callable[[], Awaitable[Any]]],
+    compensate: Callable[[Any], Awaitable[None]],
+    logger: interface.IOtelLogger | None = None,
+) -> list[Any]:
+    """
+    Запускает операции над storage параллельно.
+    При ошибке любой из них остальные отменяются, а для уже завершившихся успешно вызывается compensate.
+    """
+    tasks = [asyncio.create_task(operation()) for operation in operations]
+
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task in tasks:
+            if task.cancelled() or task.exception() is not None:
+                continue
+            try:
+                await compensate(task.result())
+            except Exception as err:
+                if logger:
+                    logger.warning(f"Не удалось откатить операцию storage: {err}")
+        raise
+
+
+async def upload_files(
+    storage: interface.IStorage,
+    files: list[tuple[AsyncIterable[bytes] | BinaryIO, str]],
+    logger: interface.IOtelLogger | None = None,
+) -> list[model.AsyncWeedOperationResponse]:
+    """Загружает файлы параллельно; если хоть один не загрузился, уже загруженные удаляются"""
+    operations = [
+        lambda stream=stream, name=name: storage.upload_stream(stream, name)
+        for stream, name in files
+    ]
+
+    async def compensate(result: model.AsyncWeedOperationResponse) -> None:
+        await storage.delete(result.fid, "")
+
+    return await run_storage_operations(operations, compensate, logger)
+
+
+async def delete_uploaded(
+    storage: interface.IStorage,
+    results: list[model.AsyncWeedOperationResponse],
+    logger: interface.IOtelLogger | None = None,
+) -> None:
+    """Удаляет загруженные файлы, когда следующий за загрузкой шаг не удался"""
+    outcomes = await asyncio.gather(
+        *(storage.delete(result.fid, "") for result in results),
+        return_exceptions=True,
+    )
+    for outcome in outcomes:
+        if isinstance(outcome, Exception) and logger:
+            logger.warning(f"Не удалось удалить загруженный файл: {outcome}")